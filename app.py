@@ -1,12 +1,20 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional, Literal
+from pathlib import Path
+import os
 import shutil
-from search_service import SearchService
+import uuid
+from search_service import SearchService, ServiceNotReady
+from ingest_jobs import IngestQueue, IngestQueueFull, JobStore
+from logs import configure_logging
+import metrics
 from config import config
 
+configure_logging()
+
 app = FastAPI(title="Document Search with Endee")
 
 app.add_middleware(
@@ -17,11 +25,32 @@ app.add_middleware(
 )
 
 search_service = SearchService()
+# Job status lives in SQLite so any worker process can answer /jobs/{id}
+ingest_queue = IngestQueue(search_service.index_document, JobStore(config.DATA_DIR / "jobs.db"))
+
+
+@app.on_event("startup")
+async def startup():
+    # Components load in the background so the server binds immediately; see /ready
+    search_service.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    ingest_queue.shutdown()
+    await search_service.aclose()
 
 
 class SearchRequest(BaseModel):
     query: str
     top_k: Optional[int] = 5
+    mode: Optional[Literal["vector", "hybrid", "lexical"]] = None
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: Optional[int] = 5
+    mode: Optional[Literal["vector", "hybrid", "lexical"]] = None
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -308,6 +337,14 @@ async def home():
                 font-size: 0.85em;
                 color: #94a3b8;
             }
+            .doc-delete {
+                background: none;
+                border: none;
+                color: #64748b;
+                cursor: pointer;
+                font-size: 1em;
+            }
+            .doc-delete:hover { color: #f87171; }
 
             .empty-state {
                 text-align: center;
@@ -403,16 +440,20 @@ async def home():
                     const formData = new FormData();
                     formData.append('file', fileInput.files[0]);
                     const response = await fetch('/upload', { method: 'POST', body: formData });
-                    const result = await response.json();
+                    let result = await response.json();
 
                     if (response.ok) {
-                        status.innerHTML = '<div class="status success">✅ ' + result.details.filename + ' indexed — ' + result.details.chunks_indexed + ' chunks</div>';
+                        result = await waitForJob(result.status_url, status);
+                    }
+
+                    if (response.ok && result.stage === 'done') {
+                        status.innerHTML = '<div class="status success">✅ ' + result.result.filename + ' indexed — ' + result.result.chunks_indexed + ' chunks</div>';
                         loadDocuments();
                         fileInput.value = '';
                         document.getElementById('fileName').classList.remove('visible');
                         btn.classList.remove('visible');
                     } else {
-                        status.innerHTML = '<div class="status error">❌ ' + (result.detail || 'Failed') + '</div>';
+                        status.innerHTML = '<div class="status error">❌ ' + (result.detail || result.error || 'Failed') + '</div>';
                     }
                 } catch (error) {
                     status.innerHTML = '<div class="status error">❌ ' + error.message + '</div>';
@@ -421,6 +462,17 @@ async def home():
                 btn.textContent = 'Upload & Index';
             }
 
+            async function waitForJob(statusUrl, status) {
+                while (true) {
+                    const job = await (await fetch(statusUrl)).json();
+                    if (job.stage === 'done' || job.stage === 'failed') return job;
+                    const p = job.progress;
+                    const detail = p.chunks_total ? ' — ' + p.chunks_embedded + '/' + p.chunks_total + ' embedded, ' + p.vectors_inserted + ' inserted' : '';
+                    status.innerHTML = '<div class="status loading"><span class="spinner"></span> ' + job.stage + detail + '...</div>';
+                    await new Promise(resolve => setTimeout(resolve, 500));
+                }
+            }
+
             async function askQuestion(e) {
                 e.preventDefault();
                 const btn = document.getElementById('askBtn');
@@ -524,21 +576,39 @@ async def home():
                         return;
                     }
 
-                    let html = '';
+                    // Built with DOM calls so filenames are never parsed as HTML or JS
+                    listDiv.innerHTML = '';
                     entries.forEach(([name, info]) => {
                         const ext = name.split('.').pop().toLowerCase();
                         const icon = ext === 'pdf' ? '📕' : ext === 'docx' || ext === 'doc' ? '📘' : '📄';
-                        html += '<div class="doc-item">';
-                        html += '  <div class="doc-info"><span class="doc-icon">' + icon + '</span><span class="doc-name">' + name + '</span></div>';
-                        html += '  <span class="doc-chunks">' + info.chunks + ' chunks</span>';
-                        html += '</div>';
+                        const item = document.createElement('div');
+                        item.className = 'doc-item';
+                        item.innerHTML = '<div class="doc-info"><span class="doc-icon">' + icon + '</span><span class="doc-name"></span></div>'
+                            + '<div class="doc-info"><span class="doc-chunks"></span><button class="doc-delete" title="Delete">✕</button></div>';
+                        item.querySelector('.doc-name').textContent = name;
+                        item.querySelector('.doc-chunks').textContent = info.chunks + ' chunks';
+                        item.querySelector('.doc-delete').addEventListener('click', () => deleteDocument(name));
+                        listDiv.appendChild(item);
                     });
-                    listDiv.innerHTML = html;
                 } catch (error) {
                     console.error('Error:', error);
                 }
             }
 
+            async function deleteDocument(name) {
+                if (!confirm('Delete ' + name + ' from the index?')) return;
+                try {
+                    const response = await fetch('/documents/' + encodeURIComponent(name), { method: 'DELETE' });
+                    if (!response.ok) {
+                        const result = await response.json().catch(() => ({}));
+                        alert('❌ ' + (result.detail || result.error || 'Delete failed'));
+                    }
+                } catch (error) {
+                    alert('❌ ' + error.message);
+                }
+                loadDocuments();
+            }
+
             loadDocuments();
         </script>
     </body>
@@ -546,38 +616,83 @@ async def home():
     """
 
 
-@app.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
+def _save_upload(file: UploadFile, file_path: Path):
+    # Write under a private name and rename, so a worker indexing this filename never reads a partial file
+    tmp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.part")
     try:
-        file_path = config.UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as f:
+        with open(tmp_path, "wb") as f:
             shutil.copyfileobj(file.file, f)
+        os.replace(tmp_path, file_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
 
-        result = search_service.index_document(str(file_path))
 
-        if "error" in result:
-            raise HTTPException(status_code=400, detail=result["error"])
+@app.post("/upload")
+async def upload_document(file: UploadFile = File(...), replace: bool = False):
+    try:
+        if Path(file.filename).suffix.lower() not in config.SUPPORTED_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported file format: {file.filename}")
 
-        return {
-            "status": "success",
-            "message": f"Indexed {file.filename}",
-            "details": result
-        }
+        file_path = config.UPLOAD_DIR / file.filename
+        await search_service.run_blocking(_save_upload, file, file_path)
+
+        job = ingest_queue.submit(str(file_path), replace=replace)
+        return JSONResponse(status_code=202, content={
+            "status": "accepted",
+            "message": f"Queued {file.filename} for indexing",
+            "job_id": job.id,
+            "status_url": f"/jobs/{job.id}"
+        })
+    except IngestQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Ingest queue is full: {e}")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = ingest_queue.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+
 @app.post("/search")
 async def search(request: SearchRequest):
     try:
-        results = search_service.search(request.query, request.top_k)
+        results = await search_service.asearch(request.query, request.top_k, request.mode)
         return {
             "query": request.query,
             "results": results,
             "count": len(results)
         }
+    except ServiceNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/search/batch")
+async def search_batch(request: BatchSearchRequest):
+    if len(request.queries) > config.SEARCH_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries: {len(request.queries)} (max {config.SEARCH_BATCH_MAX})"
+        )
+    try:
+        batches = await search_service.asearch_many(request.queries, request.top_k, request.mode)
+        return {
+            "results": [
+                {"query": query, "results": results, "count": len(results)}
+                for query, results in zip(request.queries, batches)
+            ],
+            "count": len(batches)
+        }
+    except ServiceNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -585,18 +700,45 @@ async def search(request: SearchRequest):
 @app.post("/answer")
 async def answer(request: SearchRequest):
     try:
-        result = search_service.answer(request.query, request.top_k)
-        # Also include raw chunks for "show details"
-        chunks = search_service.search(request.query, request.top_k)
-        result["chunks"] = chunks
-        return result
+        # One retrieval pass feeds both the answer and the "show details" chunks
+        return await search_service.aanswer(request.query, request.top_k, mode=request.mode)
+    except ServiceNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/documents")
 async def get_documents():
-    return search_service.get_documents()
+    try:
+        return search_service.get_documents()
+    except ServiceNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+
+@app.delete("/documents/{filename}")
+async def delete_document(filename: str):
+    try:
+        result = await search_service.run_blocking(search_service.delete_document, filename)
+        if "error" in result:
+            raise HTTPException(status_code=502 if "vectors_failed" in result else 404, detail=result["error"])
+        return result
+    except HTTPException:
+        raise
+    except ServiceNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/stats")
+async def stats():
+    return search_service.get_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/health")
@@ -604,6 +746,14 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def ready():
+    readiness = search_service.readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app:app", host=config.APP_HOST, port=config.APP_PORT)
+    if config.WORKERS > 1 and config.CHUNK_STORE_BACKEND == "json":
+        raise SystemExit("WORKERS > 1 needs CHUNK_STORE_BACKEND=sqlite; the JSON store is single-process")
+    uvicorn.run("app:app", host=config.APP_HOST, port=config.APP_PORT, workers=config.WORKERS)
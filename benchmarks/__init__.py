@@ -0,0 +1,5 @@
+"""Offline benchmarks for ingest throughput and query latency.
+
+Run with `python -m benchmarks.run --help`. Everything runs in-process against a fake Endee
+server (benchmarks.fake_endee) and synthetic documents (benchmarks.corpus).
+"""
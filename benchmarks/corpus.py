@@ -0,0 +1,116 @@
+from typing import List, Dict
+from pathlib import Path
+import random
+from docx import Document
+
+WORDS = (
+    "data model index vector search query document chunk token embedding retrieval latency "
+    "throughput cache batch stream page section table figure result method system network "
+    "learning training inference quantization memory disk compression schedule request "
+    "response server client endpoint pipeline stage metric histogram percentile benchmark "
+    "semester course elective credit syllabus department laboratory assignment examination "
+    "material transformation thermal structure analysis design process control signal energy"
+).split()
+
+
+class CorpusGenerator:
+    """Deterministic synthetic documents: pseudo-English paragraphs with some course-code style ids"""
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+
+    def sentence(self) -> str:
+        words = self.random.choices(WORDS, k=self.random.randint(8, 20))
+        if self.random.random() < 0.2:
+            words.insert(self.random.randrange(len(words)), f"{self.random.randint(18, 22)}CS{self.random.randint(10, 99)}")
+        return " ".join(words).capitalize() + "."
+
+    def paragraph(self) -> str:
+        return " ".join(self.sentence() for _ in range(self.random.randint(3, 7)))
+
+    def paragraphs(self, count: int) -> List[str]:
+        return [self.paragraph() for _ in range(count)]
+
+    def query(self) -> str:
+        return " ".join(self.random.sample(WORDS, self.random.randint(2, 5)))
+
+
+def write_txt(path: Path, paragraphs: List[str]):
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+
+def write_docx(path: Path, paragraphs: List[str]):
+    document = Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(str(path))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, paragraphs: List[str], lines_per_page: int = 45, line_width: int = 90):
+    """Minimal text-only PDF (Helvetica, one Tj per line) that PyPDF2 can extract"""
+    lines = []
+    for paragraph in paragraphs:
+        line = ""
+        for word in paragraph.split():
+            if len(line) + len(word) + 1 > line_width:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.extend([line, ""])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then (page, content) pairs
+    objects: Dict[int, bytes] = {3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for i, page_lines in enumerate(pages):
+        page_number, content_number = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_number} 0 R")
+        stream = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(
+            f"({_pdf_escape(line)}) Tj T*" for line in page_lines
+        ) + " ET"
+        stream_bytes = stream.encode("latin-1", "replace")
+        objects[content_number] = (
+            f"<< /Length {len(stream_bytes)} >>\nstream\n".encode() + stream_bytes + b"\nendstream"
+        )
+        objects[page_number] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_number} 0 R >>"
+        ).encode()
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n".encode() + objects[number] + b"\nendobj\n"
+    xref = len(out)
+    size = max(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for number in range(1, size):
+        out += f"{offsets[number]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+
+WRITERS = {"txt": write_txt, "docx": write_docx, "pdf": write_pdf}
+
+
+def generate_corpus(out_dir: Path, documents: int, paragraphs: int, formats: List[str],
+                    seed: int = 0) -> List[Path]:
+    """Write `documents` files per format, each with `paragraphs` paragraphs; returns their paths"""
+    generator = CorpusGenerator(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for fmt in formats:
+        writer = WRITERS[fmt]
+        for i in range(documents):
+            path = out_dir / f"synthetic_{i:04d}.{fmt}"
+            writer(path, generator.paragraphs(paragraphs))
+            paths.append(path)
+    return paths
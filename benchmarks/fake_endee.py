@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+import json
+import threading
+import msgpack
+import numpy as np
+
+
+class _Index:
+    """Brute-force cosine index, vectorized so the fake is never the bottleneck being measured"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.matrix = np.zeros((1024, dim), dtype=np.float32)
+        self.lock = threading.Lock()
+
+    def upsert(self, items: List[Dict]):
+        with self.lock:
+            for item in items:
+                vector = item["vector"]
+                if isinstance(vector, bytes):
+                    vector = np.frombuffer(vector, dtype="<f4")
+                vector = np.asarray(vector, dtype=np.float32)
+                vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+                position = self.positions.get(item["id"])
+                if position is None:
+                    position = len(self.ids)
+                    if position >= self.matrix.shape[0]:
+                        self.matrix = np.vstack([self.matrix, np.zeros_like(self.matrix)])
+                    self.ids.append(item["id"])
+                    self.positions[item["id"]] = position
+                self.matrix[position] = vector
+
+    def delete(self, vector_id: str):
+        with self.lock:
+            position = self.positions.pop(vector_id, None)
+            if position is None:
+                return
+            last = len(self.ids) - 1
+            if position != last:
+                self.matrix[position] = self.matrix[last]
+                self.ids[position] = self.ids[last]
+                self.positions[self.ids[position]] = position
+            self.ids.pop()
+
+    def search(self, query: List[float], k: int) -> List[List]:
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with self.lock:
+            count = len(self.ids)
+            if count == 0 or k <= 0:
+                return []
+            scores = self.matrix[:count] @ query
+            k = min(k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [[float(scores[i]), self.ids[i]] for i in top]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY each response waits on a delayed ACK
+    disable_nagle_algorithm = True
+    server: "FakeEndeeServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _parts(self) -> List[str]:
+        return [unquote(part) for part in self.path.split("?")[0].strip("/").split("/")]
+
+    def do_GET(self):
+        if self._parts() == ["api", "v1", "index", "list"]:
+            names = list(self.server.indexes)
+            self._send(200, json.dumps({"indexes": [{"name": n} for n in names]}).encode())
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        body = self._body()
+        parts = self._parts()
+        if parts == ["api", "v1", "index", "create"]:
+            payload = json.loads(body)
+            self.server.indexes.setdefault(payload["index_name"], _Index(payload["dim"]))
+            self._send(200, b'{"status": "created"}')
+            return
+
+        index = self.server.indexes.get(parts[3]) if len(parts) > 4 else None
+        if index is None:
+            self._send(404, b'{"error": "unknown index"}')
+        elif parts[4:] == ["vector", "insert"]:
+            if "msgpack" in self.headers.get("Content-Type", ""):
+                items = msgpack.unpackb(body, raw=False)
+            else:
+                items = json.loads(body)
+            index.upsert(items)
+            self._send(200, b'{"status": "inserted"}')
+        elif parts[4:] == ["search"]:
+            payload = json.loads(body)
+            results = index.search(payload["vector"], payload.get("k", 5))
+            self._send(200, msgpack.packb(results), "application/msgpack")
+        else:
+            self._send(404, b'{"error": "not found"}')
+
+    def do_DELETE(self):
+        self._body()
+        parts = self._parts()
+        index = self.server.indexes.get(parts[3]) if len(parts) > 6 else None
+        if index is None or parts[4] != "vector" or parts[6] != "delete":
+            self._send(404, b'{"error": "not found"}')
+            return
+        index.delete(parts[5])
+        self._send(200, b'{"status": "deleted"}')
+
+
+class FakeEndeeServer(ThreadingHTTPServer):
+    """In-process stand-in for the Endee HTTP API (index create/list, insert, msgpack search, delete)"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.indexes: Dict[str, _Index] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeEndeeServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-endee", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FakeEndeeServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,224 @@
+"""Ingest throughput and query latency benchmark.
+
+    python -m benchmarks.run --documents 10 --paragraphs 80 --concurrency 1,4,16 --output run.json
+
+Builds a synthetic corpus, indexes it with SearchService.index_document (chunks/sec per format),
+then drives /search and /answer through the ASGI app at each concurrency level and reports
+p50/p95/p99 latency and QPS. The vector backend is an in-process fake Endee server unless
+--backend local is given, so no network or external service is needed. Results are JSON.
+"""
+from typing import List, Dict
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.corpus import CorpusGenerator, generate_corpus, WRITERS
+from benchmarks.fake_endee import FakeEndeeServer
+from config import config
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--documents", type=int, default=5, help="documents per format")
+    parser.add_argument("--paragraphs", type=int, default=60, help="paragraphs per document")
+    parser.add_argument("--formats", default="txt,docx,pdf", help="comma-separated subset of txt,docx,pdf")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint and level")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests before each level")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--mode", choices=["vector", "hybrid", "lexical"], default=None)
+    parser.add_argument("--endpoints", default="search,answer", help="comma-separated subset of search,answer")
+    parser.add_argument("--backend", choices=["endee", "local"], default="endee")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary work directory")
+    return parser.parse_args(argv)
+
+
+def percentiles(latencies: List[float]) -> Dict:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    ms = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "max_ms": round(float(ms.max()), 3)
+    }
+
+
+def configure(work: Path, args: argparse.Namespace, server: FakeEndeeServer = None):
+    """Point the app's settings at a scratch directory (and the fake server) before it is imported"""
+    for attr in ("DATA_DIR", "UPLOAD_DIR", "EMBEDDINGS_DIR"):
+        path = work / attr.lower()
+        path.mkdir(parents=True, exist_ok=True)
+        setattr(config, attr, path)
+    config.VECTOR_BACKEND = args.backend
+    if server is not None:
+        config.ENDEE_BASE_URL = server.url
+
+
+def run_ingest(service, paths: List[Path]) -> Dict:
+    by_format: Dict[str, Dict] = {}
+    for path in paths:
+        start = time.perf_counter()
+        result = service.index_document(str(path))
+        elapsed = time.perf_counter() - start
+        if "error" in result:
+            raise RuntimeError(f"Indexing {path.name} failed: {result['error']}")
+        stats = by_format.setdefault(path.suffix.lstrip("."), {"documents": 0, "chunks": 0, "seconds": 0.0})
+        stats["documents"] += 1
+        stats["chunks"] += result["chunks_indexed"]
+        stats["seconds"] += elapsed
+
+    for stats in by_format.values():
+        stats["chunks_per_sec"] = round(stats["chunks"] / stats["seconds"], 2) if stats["seconds"] else None
+        stats["seconds"] = round(stats["seconds"], 4)
+    chunks = sum(s["chunks"] for s in by_format.values())
+    seconds = sum(s["seconds"] for s in by_format.values())
+    return {
+        "documents": len(paths),
+        "chunks": chunks,
+        "seconds": round(seconds, 4),
+        "chunks_per_sec": round(chunks / seconds, 2) if seconds else None,
+        "by_format": by_format
+    }
+
+
+async def run_level(client, endpoint: str, queries: List[str], concurrency: int,
+                    warmup: int, top_k: int, mode: str) -> Dict:
+    """Send len(queries) - warmup measured requests from `concurrency` concurrent workers"""
+    async def send(query: str) -> bool:
+        payload = {"query": query, "top_k": top_k}
+        if mode:
+            payload["mode"] = mode
+        response = await client.post(f"/{endpoint}", json=payload)
+        return response.status_code == 200
+
+    for query in queries[:warmup]:
+        await send(query)
+
+    pending = iter(queries[warmup:])
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for query in pending:
+            start = time.perf_counter()
+            ok = await send(query)
+            latencies.append(time.perf_counter() - start)
+            errors += 0 if ok else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "qps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        **percentiles(latencies)
+    }
+
+
+async def run_queries(app, service, args: argparse.Namespace, levels: List[int], endpoints: List[str]) -> Dict:
+    import httpx
+
+    generator = CorpusGenerator(args.seed + 1)
+    results: Dict[str, List[Dict]] = {endpoint: [] for endpoint in endpoints}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for endpoint in endpoints:
+            for concurrency in levels:
+                # Fresh queries per level so earlier levels don't warm the query-embedding cache
+                queries = [generator.query() for _ in range(args.warmup + args.requests)]
+                results[endpoint].append(await run_level(
+                    client, endpoint, queries, concurrency, args.warmup, args.top_k, args.mode
+                ))
+    # Close on this loop: the Endee async client is bound to it
+    await service.aclose()
+    return results
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent.parent, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit
+    }
+
+
+def main(argv: List[str] = None) -> Dict:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    formats = [f for f in args.formats.split(",") if f]
+    unknown = set(formats) - set(WRITERS)
+    if unknown:
+        raise SystemExit(f"Unknown formats: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    endpoints = [e for e in args.endpoints.split(",") if e]
+
+    work = Path(tempfile.mkdtemp(prefix="docsearch-bench-"))
+    server = FakeEndeeServer().start() if args.backend == "endee" else None
+    try:
+        configure(work, args, server)
+        # Imported only now so the app picks up the scratch settings
+        import app as app_module
+
+        service = app_module.search_service
+        service.start()
+        service.wait_ready()
+
+        paths = generate_corpus(work / "corpus", args.documents, args.paragraphs, formats, args.seed)
+        ingest = run_ingest(service, paths)
+        queries = asyncio.run(run_queries(app_module.app, service, args, levels, endpoints))
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "environment": environment(),
+            "settings": {
+                **{k: v for k, v in vars(args).items() if k not in ("output", "keep")},
+                "embedding_backend": config.EMBEDDING_BACKEND,
+                "embedding_model": config.EMBEDDING_MODEL,
+                "chunk_unit": config.CHUNK_UNIT,
+                "insert_format": config.ENDEE_INSERT_FORMAT,
+                "insert_batch_size": config.INSERT_BATCH_SIZE,
+                "query_batch_window_ms": config.QUERY_BATCH_WINDOW_MS
+            },
+            "ingest": ingest,
+            "queries": queries
+        }
+    finally:
+        if server is not None:
+            server.stop()
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
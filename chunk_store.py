@@ -0,0 +1,379 @@
+from typing import List, Dict, Iterator, Tuple, Optional
+from pathlib import Path
+import logging
+import json
+import os
+import sqlite3
+import threading
+from file_lock import FileLock
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkStore:
+    """Chunk text keyed by vector id, per-document metadata keyed by filename, and the corpus generation"""
+
+    def get(self, vector_id: str, default: Optional[Dict] = None) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_many(self, vector_ids: List[str]) -> Dict[str, Dict]:
+        raise NotImplementedError
+
+    def put_many(self, records: Dict[str, Dict]):
+        raise NotImplementedError
+
+    def delete_many(self, vector_ids: List[str]):
+        raise NotImplementedError
+
+    def ids_for_document(self, filename: str) -> List[str]:
+        raise NotImplementedError
+
+    def get_document(self, filename: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def put_document(self, filename: str, record: Dict):
+        raise NotImplementedError
+
+    def delete_document(self, filename: str):
+        raise NotImplementedError
+
+    def documents(self) -> Dict[str, Dict]:
+        raise NotImplementedError
+
+    def generation(self) -> int:
+        """Counter bumped after every corpus write, so other processes can tell their view is stale"""
+        raise NotImplementedError
+
+    def bump_generation(self) -> int:
+        raise NotImplementedError
+
+    def change_seq(self) -> int:
+        """Position of the newest entry in the log of changed vector ids"""
+        return 0
+
+    def changes_since(self, seq: int) -> Optional[Tuple[int, List[str]]]:
+        """Vector ids put or deleted after log position `seq`, with the newest position.
+
+        None when the log no longer reaches back to `seq` (or isn't kept); the caller has to reload everything.
+        """
+        return None
+
+    def compact(self):
+        pass
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _write_json(path: Path, data):
+    # Write-then-rename, so a crash mid-write never leaves a truncated file behind
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _retire(path: Path):
+    # The rename is the migration marker, so it holds wherever DATA_DIR is mounted next time
+    os.replace(path, path.with_suffix(path.suffix + ".migrated"))
+    logger.info("Renamed %s to %s.migrated", path.name, path.name)
+
+
+class JsonChunkStore(ChunkStore):
+    """Legacy store: the whole corpus in memory, rewritten to one JSON file on every change.
+
+    Single-process only; other processes never see its writes.
+    """
+
+    def __init__(self, path: Path, documents_path: Path):
+        self.path = path
+        self.documents_path = documents_path
+        self._lock = threading.Lock()
+        self._generation = 0
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                self._data = json.load(f)
+        else:
+            self._data = {}
+        if self.documents_path.exists():
+            with open(self.documents_path, 'r') as f:
+                self._documents = json.load(f).get("documents", {})
+        else:
+            self._documents = {}
+
+    def get(self, vector_id: str, default: Optional[Dict] = None) -> Optional[Dict]:
+        return self._data.get(vector_id, default)
+
+    def get_many(self, vector_ids: List[str]) -> Dict[str, Dict]:
+        return {vid: self._data[vid] for vid in vector_ids if vid in self._data}
+
+    def put_many(self, records: Dict[str, Dict]):
+        with self._lock:
+            self._data.update(records)
+            _write_json(self.path, self._data)
+
+    def delete_many(self, vector_ids: List[str]):
+        with self._lock:
+            for vid in vector_ids:
+                self._data.pop(vid, None)
+            _write_json(self.path, self._data)
+
+    def ids_for_document(self, filename: str) -> List[str]:
+        return [vid for vid, record in self._data.items() if record.get("filename") == filename]
+
+    def get_document(self, filename: str) -> Optional[Dict]:
+        return self._documents.get(filename)
+
+    def put_document(self, filename: str, record: Dict):
+        with self._lock:
+            self._documents[filename] = record
+            _write_json(self.documents_path, {"documents": self._documents})
+
+    def delete_document(self, filename: str):
+        with self._lock:
+            if self._documents.pop(filename, None) is not None:
+                _write_json(self.documents_path, {"documents": self._documents})
+
+    def documents(self) -> Dict[str, Dict]:
+        return dict(self._documents)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump_generation(self) -> int:
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        return iter(list(self._data.items()))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SqliteChunkStore(ChunkStore):
+    """Indexed on-disk store: inserts cost O(new chunks), lookups hit the primary key.
+
+    Every write is its own transaction, so several worker processes can share one database file.
+    Reads go through per-thread connections that never take the write lock: in WAL mode they see
+    the last committed state, so a large insert or a VACUUM never stalls a query. Chunk writes
+    also append their ids to a changelog, trimmed to the newest CHANGELOG_ROWS entries, from
+    which other processes update their in-memory indexes.
+    """
+
+    CHANGELOG_ROWS = 200_000
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        # Writers in other processes hold the database lock briefly; wait for them instead of failing
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "vector_id TEXT PRIMARY KEY, filename TEXT NOT NULL, record TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_filename ON chunks (filename)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents (filename TEXT PRIMARY KEY, record TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, vector_id TEXT NOT NULL)"
+            )
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def get(self, vector_id: str, default: Optional[Dict] = None) -> Optional[Dict]:
+        row = self._reader().execute(
+            "SELECT record FROM chunks WHERE vector_id = ?", (vector_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def get_many(self, vector_ids: List[str]) -> Dict[str, Dict]:
+        if not vector_ids:
+            return {}
+        placeholders = ",".join("?" * len(vector_ids))
+        rows = self._reader().execute(
+            f"SELECT vector_id, record FROM chunks WHERE vector_id IN ({placeholders})",
+            list(vector_ids)
+        ).fetchall()
+        return {vid: json.loads(record) for vid, record in rows}
+
+    def put_many(self, records: Dict[str, Dict]):
+        rows = [
+            (vid, record.get("filename", ""), json.dumps(record))
+            for vid, record in records.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (vector_id, filename, record) VALUES (?, ?, ?)",
+                rows
+            )
+            self._log_changes(list(records))
+
+    def delete_many(self, vector_ids: List[str]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE vector_id = ?", [(vid,) for vid in vector_ids]
+            )
+            self._log_changes(vector_ids)
+
+    def _log_changes(self, vector_ids: List[str]):
+        self._conn.executemany("INSERT INTO changes (vector_id) VALUES (?)", [(vid,) for vid in vector_ids])
+
+    def ids_for_document(self, filename: str) -> List[str]:
+        rows = self._reader().execute(
+            "SELECT vector_id FROM chunks WHERE filename = ?", (filename,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_document(self, filename: str) -> Optional[Dict]:
+        row = self._reader().execute(
+            "SELECT record FROM documents WHERE filename = ?", (filename,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_document(self, filename: str, record: Dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (filename, record) VALUES (?, ?)",
+                (filename, json.dumps(record))
+            )
+
+    def delete_document(self, filename: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+
+    def documents(self) -> Dict[str, Dict]:
+        rows = self._reader().execute("SELECT filename, record FROM documents ORDER BY rowid").fetchall()
+        return {filename: json.loads(record) for filename, record in rows}
+
+    def generation(self) -> int:
+        return int(self._get_meta("generation") or 0)
+
+    def bump_generation(self) -> int:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+            trimmed = (self._conn.execute("SELECT MAX(seq) FROM changes").fetchone()[0] or 0) - self.CHANGELOG_ROWS
+            if self._conn.execute("DELETE FROM changes WHERE seq <= ?", (trimmed,)).rowcount:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('changes_trimmed', ?)", (trimmed,)
+                )
+        return int(row[0])
+
+    def change_seq(self) -> int:
+        row = self._reader().execute("SELECT MAX(seq) FROM changes").fetchone()
+        return row[0] or 0
+
+    def changes_since(self, seq: int) -> Optional[Tuple[int, List[str]]]:
+        conn = self._reader()
+        # One read transaction, so the trim mark and the rows come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'changes_trimmed'").fetchone()
+            if row and seq < int(row[0]):
+                return None
+            rows = conn.execute(
+                "SELECT seq, vector_id FROM changes WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        if not rows:
+            return seq, []
+        return rows[-1][0], list(dict.fromkeys(vid for _, vid in rows))
+
+    def compact(self):
+        """VACUUM once free pages pass CHUNK_STORE_VACUUM_RATIO, so the file tracks the live corpus"""
+        with self._lock:
+            free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            total_pages = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            if total_pages and free_pages / total_pages >= config.CHUNK_STORE_VACUUM_RATIO:
+                self._conn.execute("VACUUM")
+                logger.info("Compacted chunk store: reclaimed %d of %d pages", free_pages, total_pages)
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        rows = self._reader().execute("SELECT vector_id, record FROM chunks").fetchall()
+        for vid, record in rows:
+            yield vid, json.loads(record)
+
+    def __len__(self) -> int:
+        return self._reader().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._reader().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def migrate_json(self, json_path: Path) -> int:
+        """One-time import of a legacy chunks_store.json; returns the number of chunks copied"""
+        if not json_path.exists():
+            return 0
+        with open(json_path, 'r') as f:
+            records = json.load(f)
+        self.put_many(records)
+        _retire(json_path)
+        logger.info("Migrated %d chunks from %s", len(records), json_path.name)
+        return len(records)
+
+    def migrate_documents(self, json_path: Path) -> int:
+        """One-time import of a legacy document_metadata.json; returns the number of documents copied"""
+        if not json_path.exists():
+            return 0
+        with open(json_path, 'r') as f:
+            documents = json.load(f).get("documents", {})
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO documents (filename, record) VALUES (?, ?)",
+                [(filename, json.dumps(record)) for filename, record in documents.items()]
+            )
+        _retire(json_path)
+        logger.info("Migrated %d documents from %s", len(documents), json_path.name)
+        return len(documents)
+
+    def close(self):
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            self._conn.close()
+
+
+def create_chunk_store(migration_lock: FileLock) -> ChunkStore:
+    """Open the configured store; `migration_lock` is held only while legacy JSON files are imported"""
+    legacy_path = config.DATA_DIR / "chunks_store.json"
+    documents_path = config.DATA_DIR / "document_metadata.json"
+    if config.CHUNK_STORE_BACKEND == "json":
+        return JsonChunkStore(legacy_path, documents_path)
+    if config.CHUNK_STORE_BACKEND == "sqlite":
+        store = SqliteChunkStore(config.DATA_DIR / "chunks.db")
+        if legacy_path.exists() or documents_path.exists():
+            # The migrate_* calls re-check under the lock, so only one worker imports each file
+            with migration_lock.hold():
+                store.migrate_json(legacy_path)
+                store.migrate_documents(documents_path)
+        return store
+    raise ValueError(f"Unsupported chunk store backend: {config.CHUNK_STORE_BACKEND}")
@@ -2,8 +2,17 @@ import os
 from pathlib import Path
 
 class Config:
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "endee")
     ENDEE_BASE_URL = os.getenv("ENDEE_BASE_URL", "http://localhost:8080")
     ENDEE_AUTH_TOKEN = os.getenv("ENDEE_AUTH_TOKEN", "")
+    ENDEE_MAX_CONNECTIONS = int(os.getenv("ENDEE_MAX_CONNECTIONS", "20"))
+    ENDEE_CONNECT_TIMEOUT = float(os.getenv("ENDEE_CONNECT_TIMEOUT", "3"))
+    ENDEE_READ_TIMEOUT = float(os.getenv("ENDEE_READ_TIMEOUT", "10"))
+    ENDEE_SEARCH_TIMEOUT = float(os.getenv("ENDEE_SEARCH_TIMEOUT", "5"))
+    ENDEE_INSERT_TIMEOUT = float(os.getenv("ENDEE_INSERT_TIMEOUT", "60"))
+    ENDEE_MAX_RETRIES = int(os.getenv("ENDEE_MAX_RETRIES", "2"))
+    ENDEE_RETRY_BACKOFF = float(os.getenv("ENDEE_RETRY_BACKOFF", "0.2"))
+    ENDEE_INSERT_FORMAT = os.getenv("ENDEE_INSERT_FORMAT", "json")
 
     BASE_DIR = Path(__file__).parent
     UPLOAD_DIR = BASE_DIR / "uploads"
@@ -12,13 +21,54 @@ class Config:
 
     CHUNK_SIZE = 500
     CHUNK_OVERLAP = 50
+    CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars")
+    CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "254"))
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
     SUPPORTED_FORMATS = ['.pdf', '.docx', '.doc', '.txt']
+    PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+    CHUNK_STORE_BACKEND = os.getenv("CHUNK_STORE_BACKEND", "sqlite")
+    CHUNK_STORE_VACUUM_RATIO = float(os.getenv("CHUNK_STORE_VACUUM_RATIO", "0.25"))
 
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
     VECTOR_DIMENSION = 384
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+    ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+    ONNX_MODEL_DIR = Path(os.getenv("ONNX_MODEL_DIR", str(BASE_DIR / "embeddings" / "onnx")))
+    ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+    EMBEDDING_PARITY_THRESHOLD = float(os.getenv("EMBEDDING_PARITY_THRESHOLD", "0.99"))
+    QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+    QUERY_BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", "3"))
+    QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "32"))
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
 
     INDEX_NAME = "documents"
+    INSERT_BATCH_SIZE = int(os.getenv("INSERT_BATCH_SIZE", "64"))
+    INSERT_MAX_IN_FLIGHT = int(os.getenv("INSERT_MAX_IN_FLIGHT", "2"))
     TOP_K_RESULTS = 5
+    SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "4"))
+    RRF_K = int(os.getenv("RRF_K", "60"))
+    SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "256"))
+    LEXICAL_COMPACT_RATIO = float(os.getenv("LEXICAL_COMPACT_RATIO", "0.25"))
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+    STARTUP_WAIT_TIMEOUT = float(os.getenv("STARTUP_WAIT_TIMEOUT", "300"))
+    STARTUP_RETRY_BACKOFF = float(os.getenv("STARTUP_RETRY_BACKOFF", "1"))
+    STARTUP_RETRY_MAX_DELAY = float(os.getenv("STARTUP_RETRY_MAX_DELAY", "30"))
+    EXECUTOR_WORKERS = int(os.getenv("EXECUTOR_WORKERS", "4"))
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+    INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "100"))
+    INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "500"))
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    GENERATION_CHECK_INTERVAL = float(os.getenv("GENERATION_CHECK_INTERVAL", "0.5"))
 
     APP_HOST = "0.0.0.0"
     APP_PORT = 8000
@@ -1,91 +1,293 @@
-from typing import List, Dict
+from typing import List, Dict, Iterator, Iterable, Callable, Optional, Tuple
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+import re
+import threading
 import PyPDF2
 from docx import Document
+from metrics import Stopwatch, timed_iter, observe_stage
 from config import config
 
+logger = logging.getLogger(__name__)
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # Forking a process with live threads (executor pools, the batcher, HTTP clients) can copy
+            # held locks into the child; spawned workers start clean and only import this module
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=config.PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+
+def _extract_pdf_range(file_path: str, start: int, end: int) -> List[str]:
+    """Runs in a worker process: extract pages [start, end) of a PDF"""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
 class DocumentProcessor:
     @staticmethod
     def extract_text(file_path: str) -> str:
+        return "".join(DocumentProcessor.iter_segments(file_path))
+
+    @staticmethod
+    def iter_segments(file_path: str) -> Iterator[str]:
+        """Yield the document text piece by piece (pages, paragraphs, lines) without building one string"""
         ext = Path(file_path).suffix.lower()
 
         if ext == '.pdf':
-            return DocumentProcessor._extract_pdf(file_path)
+            for page_text in DocumentProcessor.iter_pdf_pages(file_path):
+                if page_text:
+                    yield page_text + "\n"
         elif ext in ['.docx', '.doc']:
-            return DocumentProcessor._extract_docx(file_path)
+            doc = Document(file_path)
+            first = True
+            for para in doc.paragraphs:
+                if para.text.strip():
+                    yield para.text if first else "\n" + para.text
+                    first = False
         elif ext == '.txt':
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                return f.read()
+                yield from f
         else:
             raise ValueError(f"Unsupported file format: {ext}")
 
     @staticmethod
-    def _extract_pdf(file_path: str) -> str:
-        text = ""
+    def iter_pdf_pages(file_path: str) -> Iterator[str]:
+        """Yield page texts in order; large PDFs are extracted in page ranges on a process pool"""
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text
+            page_count = len(pdf_reader.pages)
+            if page_count < config.PDF_PARALLEL_MIN_PAGES or config.PDF_EXTRACT_WORKERS <= 1:
+                for page in pdf_reader.pages:
+                    yield page.extract_text() or ""
+                return
+
+        step = config.PDF_PAGES_PER_TASK
+        pool = _get_pdf_pool()
+        futures = [
+            pool.submit(_extract_pdf_range, file_path, start, min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ]
+        # Ranges finish in any order but are yielded in page order, as soon as each is ready
+        for future in futures:
+            yield from future.result()
 
     @staticmethod
-    def _extract_docx(file_path: str) -> str:
-        doc = Document(file_path)
-        return "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
+    def shutdown():
+        global _pdf_pool
+        with _pdf_pool_lock:
+            if _pdf_pool is not None:
+                _pdf_pool.shutdown(wait=False, cancel_futures=True)
+                _pdf_pool = None
 
     @staticmethod
     def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[Dict]:
-        chunks = []
-        text = text.strip()
-        if not text:
-            return chunks
+        return list(DocumentProcessor.iter_chunks([text], chunk_size, overlap))
 
+    @staticmethod
+    def iter_chunks(segments: Iterable[str], chunk_size: int = 500, overlap: int = 50) -> Iterator[Dict]:
+        """Lazily cut a stream of text segments into ~chunk_size character chunks.
+
+        Only the current window is buffered, so memory stays flat regardless of document size.
+        Chunks end at the last '.' or newline in the second half of the window when possible.
+        """
+        buffer = ""
+        offset = 0
         start = 0
-        while start < len(text):
-            end = start + chunk_size
-            chunk_text = text[start:end]
+        segments = _StrippedStream(segments)
+        while True:
+            # Read until we can tell whether the window ends before the text does
+            while len(buffer) - (start - offset) <= chunk_size and not segments.exhausted:
+                buffer += segments.read()
 
-            if end < len(text):
+            rel = start - offset
+            remaining = len(buffer) - rel
+            if remaining <= 0:
+                return
+
+            end = start + chunk_size
+            chunk_text = buffer[rel:rel + chunk_size]
+            more = remaining > chunk_size
+            if more:
                 last_period = chunk_text.rfind('.')
                 last_newline = chunk_text.rfind('\n')
                 boundary = max(last_period, last_newline)
                 if boundary > chunk_size // 2:
                     end = start + boundary + 1
-                    chunk_text = text[start:end]
+                    chunk_text = chunk_text[:boundary + 1]
 
-            chunks.append({
-                'text': chunk_text.strip(),
-                'start': start,
-                'end': end
-            })
+            if chunk_text.strip():
+                yield {
+                    'text': chunk_text.strip(),
+                    'start': start,
+                    'end': end
+                }
+            if not more:
+                return
 
             start = end - overlap
-
-        return chunks
+            # Drop consumed text once it dominates the buffer (amortized O(1) per character)
+            if start - offset > len(buffer) // 2:
+                buffer = buffer[start - offset:]
+                offset = start
 
     @staticmethod
-    def process_document(file_path: str) -> Dict:
-        print(f"Processing: {file_path}")
-        text = DocumentProcessor.extract_text(file_path)
+    def iter_token_chunks(segments: Iterable[str], token_counter: Callable[[List[str]], List[int]],
+                          max_tokens: int = 254, overlap: int = 32) -> Iterator[Dict]:
+        """Lazily pack sentence pieces into chunks of at most max_tokens tokenizer tokens.
 
-        if not text.strip():
-            return {"error": "No text extracted from document"}
+        `token_counter` returns the token count (without special tokens) of each text it is given.
+        Trailing pieces worth up to `overlap` tokens are repeated at the start of the next chunk.
+        """
+        window = deque()
+        window_tokens = 0
+        fresh = False
+        position = 0
+
+        def emit() -> Optional[Dict]:
+            text = "".join(piece for piece, _, _ in window)
+            if not text.strip():
+                return None
+            last_piece, last_start, _ = window[-1]
+            return {'text': text.strip(), 'start': window[0][1], 'end': last_start + len(last_piece)}
+
+        for segment in _StrippedStream(segments):
+            for piece, tokens in _token_pieces(segment, token_counter, max_tokens):
+                if fresh and window_tokens + tokens > max_tokens:
+                    chunk = emit()
+                    if chunk:
+                        yield chunk
+                    fresh = False
+                    while window and (window_tokens > overlap or window_tokens + tokens > max_tokens):
+                        window_tokens -= window.popleft()[2]
+                window.append((piece, position, tokens))
+                window_tokens += tokens
+                position += len(piece)
+                fresh = True
 
-        chunks = DocumentProcessor.chunk_text(text, config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+        if fresh:
+            chunk = emit()
+            if chunk:
+                yield chunk
 
+    @staticmethod
+    def iter_document_chunks(file_path: str,
+                             token_counter: Optional[Callable[[List[str]], List[int]]] = None) -> Iterator[Dict]:
+        """Stream a document's chunks with metadata, sized in tokens when a token_counter is given"""
         filename = Path(file_path).name
-        for i, chunk in enumerate(chunks):
+        logger.info("Processing: %s", file_path)
+        # Extraction and chunking are interleaved, so time spent pulling segments is split out of the total
+        extract_time, total_time = Stopwatch(), Stopwatch()
+        segments = timed_iter(DocumentProcessor.iter_segments(file_path), extract_time)
+        if token_counter is None:
+            chunks = DocumentProcessor.iter_chunks(segments, config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+        else:
+            chunks = DocumentProcessor.iter_token_chunks(
+                segments, token_counter, config.CHUNK_TOKENS, config.CHUNK_OVERLAP_TOKENS
+            )
+
+        count = 0
+        for i, chunk in enumerate(timed_iter(chunks, total_time)):
             chunk['metadata'] = {
                 'filename': filename,
-                'chunk_id': i,
-                'total_chunks': len(chunks)
+                'chunk_id': i
             }
+            count += 1
+            yield chunk
+        observe_stage("extract", extract_time.seconds)
+        observe_stage("chunk", total_time.seconds - extract_time.seconds)
+        logger.info("Created %d chunks from %s", count, filename)
+
+    @staticmethod
+    def process_document(file_path: str) -> Dict:
+        chunks = list(DocumentProcessor.iter_document_chunks(file_path))
+
+        if not chunks:
+            return {"error": "No text extracted from document"}
+
+        for chunk in chunks:
+            chunk['metadata']['total_chunks'] = len(chunks)
 
-        print(f"Created {len(chunks)} chunks from {filename}")
         return {
-            'filename': filename,
+            'filename': Path(file_path).name,
             'chunks': chunks,
-            'total_length': len(text)
+            'total_length': chunks[-1]['end']
         }
+
+
+class _StrippedStream:
+    """Iterates segments with the stream's leading and trailing whitespace removed, like str.strip()"""
+
+    def __init__(self, segments: Iterable[str]):
+        self._segments = iter(segments)
+        self._started = False
+        self._pending_ws = ""
+        self.exhausted = False
+
+    def __iter__(self) -> Iterator[str]:
+        while not self.exhausted:
+            text = self.read()
+            if text:
+                yield text
+
+    def read(self) -> str:
+        """Next non-empty piece of text, or "" once the stream is exhausted"""
+        for segment in self._segments:
+            if not self._started:
+                segment = segment.lstrip()
+                if not segment:
+                    continue
+                self._started = True
+            core = segment.rstrip()
+            if not core:
+                self._pending_ws += segment
+                continue
+            # Hold back trailing whitespace until more text proves it isn't the end of the stream
+            text = self._pending_ws + core
+            self._pending_ws = segment[len(core):]
+            return text
+        self.exhausted = True
+        return ""
+
+
+def _token_pieces(segment: str, token_counter: Callable[[List[str]], List[int]],
+                  max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Split a segment into sentence pieces with token counts, breaking up pieces longer than max_tokens"""
+    pieces = [p for p in re.split(r'(?<=[.!?\n])', segment) if p]
+    for piece, tokens in zip(pieces, token_counter(pieces)):
+        if tokens <= max_tokens:
+            yield piece, tokens
+            continue
+        words = [w for w in re.split(r'(?<=\s)', piece) if w]
+        group, group_tokens = "", 0
+        for word, word_tokens in zip(words, token_counter(words)):
+            if word_tokens > max_tokens:
+                # A single enormous "word" (e.g. base64): cut it into evenly sized slices
+                if group:
+                    yield group, group_tokens
+                    group, group_tokens = "", 0
+                parts = -(-word_tokens // max_tokens)
+                size = -(-len(word) // parts)
+                for i in range(0, len(word), size):
+                    yield word[i:i + size], -(-word_tokens // parts)
+                continue
+            if group and group_tokens + word_tokens > max_tokens:
+                yield group, group_tokens
+                group, group_tokens = "", 0
+            group += word
+            group_tokens += word_tokens
+        if group:
+            yield group, group_tokens
@@ -0,0 +1,216 @@
+from typing import List, Dict, Optional
+from pathlib import Path
+import logging
+import json
+import re
+import numpy as np
+from config import config
+
+logger = logging.getLogger(__name__)
+
+PARITY_SAMPLES = [
+    "What is machine learning?",
+    "Deep learning is a subset of machine learning that uses neural networks with many layers.",
+    "Open elective courses offered by the department for the fifth semester",
+    "18CS51 Management and Entrepreneurship for IT Industry",
+    "The quick brown fox jumps over the lazy dog.",
+    "Phase transformation in materials and heat treatment of steels",
+    "Submit the signed form to the examination section before 5 pm on Friday.",
+    "Reinforcement learning is a type of machine learning where agents learn by interacting with an environment.",
+]
+
+
+class EmbeddingBackend:
+    """Turns text into float32 sentence embeddings; EmbeddingService adds caching on top"""
+
+    # Identifies the vectors this backend produces (cache keys, index signature)
+    name: str
+    dimension: int
+    max_seq_length: int
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        raise NotImplementedError
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """PyTorch inference through sentence-transformers"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.name = model_name
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.max_seq_length = self.model.max_seq_length
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=show_progress_bar)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        encoded = self.model.tokenizer(
+            texts, add_special_tokens=False, return_attention_mask=False, return_token_type_ids=False
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime CPU inference of an exported transformer with mean pooling, optionally int8.
+
+    The model is exported (and quantized) from the sentence-transformers checkpoint once, into
+    ONNX_MODEL_DIR/<model>/, and checked against PyTorch before first use. Later starts only
+    load onnxruntime and the Rust tokenizer, not torch.
+    """
+
+    BATCH_SIZE = 32
+
+    def __init__(self, model_name: str, quantize: bool = True, model_dir: Optional[Path] = None):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=onnx needs the onnxruntime and tokenizers packages"
+            ) from e
+
+        self.model_dir = model_dir or config.ONNX_MODEL_DIR / re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.quantize = quantize
+        self.name = f"{model_name}@onnx-int8" if quantize else f"{model_name}@onnx"
+        model_path = self.model_dir / ("model.int8.onnx" if quantize else "model.onnx")
+        info_path = self.model_dir / "backend.json"
+        if not model_path.exists() or not info_path.exists():
+            export_onnx_model(model_name, self.model_dir, quantize)
+
+        with open(info_path, 'r') as f:
+            self.info = json.load(f)
+        self.dimension = self.info["dimension"]
+        self.max_seq_length = self.info["max_seq_length"]
+        self.normalize = self.info["normalize"]
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if config.ONNX_THREADS > 0:
+            options.intra_op_num_threads = config.ONNX_THREADS
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+        tokenizer_path = str(self.model_dir / "tokenizer.json")
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+        # Token counting for chunk sizing must see the full text, so it gets an untruncated copy
+        self._counter = Tokenizer.from_file(tokenizer_path)
+        self._counter.no_truncation()
+        self._counter.no_padding()
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        # Longest first so each batch pads to similar lengths
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            positions = order[start:start + self.BATCH_SIZE]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in positions])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": mask,
+            }
+            if "token_type_ids" in self._inputs:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            hidden = self.session.run(None, feeds)[0]
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            if self.normalize:
+                pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            embeddings[positions] = pooled
+        return embeddings
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        return [len(e.ids) for e in self._counter.encode_batch(texts, add_special_tokens=False)]
+
+
+def export_onnx_model(model_name: str, model_dir: Path, quantize: bool = True) -> Dict:
+    """Export the sentence-transformers checkpoint to ONNX (plus a dynamic int8 copy) and verify it.
+
+    Needs torch and sentence-transformers, but only this once. Raises RuntimeError if the exported
+    model's embeddings drift below EMBEDDING_PARITY_THRESHOLD cosine from the PyTorch ones.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer(model_name, device="cpu")
+    modules = [type(module).__name__ for module in reference]
+    pooling = reference[1] if len(reference) > 1 else None
+    if modules[:2] != ["Transformer", "Pooling"] or not pooling.pooling_mode_mean_tokens:
+        raise RuntimeError(f"ONNX export supports mean-pooled transformer models only, got {modules}")
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = model_dir / "model.onnx"
+    logger.info("Exporting %s to %s", model_name, fp32_path)
+    transformer = reference[0].auto_model.eval()
+    sample = reference.tokenizer(["export sample"], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    reference.tokenizer.save_pretrained(str(model_dir))
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantize_dynamic(str(fp32_path), str(model_dir / "model.int8.onnx"), weight_type=QuantType.QInt8)
+
+    info = {
+        "model": model_name,
+        "dimension": reference.get_sentence_embedding_dimension(),
+        "max_seq_length": reference.max_seq_length,
+        "normalize": "Normalize" in modules,
+    }
+    with open(model_dir / "backend.json", 'w') as f:
+        json.dump(info, f)
+
+    # Check against PyTorch before the files are used for serving
+    backend = OnnxBackend(model_name, quantize, model_dir)
+    expected = np.asarray(reference.encode(PARITY_SAMPLES, convert_to_numpy=True), dtype=np.float32)
+    similarity = cosine_parity(backend.encode(PARITY_SAMPLES), expected)
+    logger.info("ONNX parity for %s: min cosine %.4f", backend.name, similarity)
+    if similarity < config.EMBEDDING_PARITY_THRESHOLD:
+        (model_dir / "backend.json").unlink()
+        raise RuntimeError(
+            f"ONNX embeddings diverge from PyTorch: min cosine {similarity:.4f} "
+            f"< {config.EMBEDDING_PARITY_THRESHOLD}"
+        )
+    info["parity_min_cosine"] = similarity
+    with open(model_dir / "backend.json", 'w') as f:
+        json.dump(info, f)
+    return info
+
+
+def cosine_parity(actual: np.ndarray, expected: np.ndarray) -> float:
+    """Smallest row-wise cosine similarity between two embedding matrices"""
+    actual = actual / np.maximum(np.linalg.norm(actual, axis=1, keepdims=True), 1e-12)
+    expected = expected / np.maximum(np.linalg.norm(expected, axis=1, keepdims=True), 1e-12)
+    return float((actual * expected).sum(axis=1).min())
+
+
+def create_embedding_backend() -> EmbeddingBackend:
+    if config.EMBEDDING_BACKEND == "sentence-transformers":
+        return SentenceTransformerBackend(config.EMBEDDING_MODEL)
+    if config.EMBEDDING_BACKEND == "onnx":
+        return OnnxBackend(config.EMBEDDING_MODEL, quantize=config.ONNX_QUANTIZE)
+    raise ValueError(f"Unsupported embedding backend: {config.EMBEDDING_BACKEND}")
@@ -0,0 +1,134 @@
+from typing import List, Dict, Tuple, Optional
+from pathlib import Path
+import logging
+import hashlib
+import re
+import threading
+import numpy as np
+from file_lock import FileLock
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingDiskCache:
+    """Append-only on-disk cache of chunk embeddings keyed by (model name, text hash).
+
+    `<model>.f32` holds the vectors as raw float32 rows (read through a memory map) and
+    `<model>.keys` holds one 16-byte text digest per row, in the same order. Appends hold a file
+    lock, so worker processes can share the files; each picks up the others' rows on a miss.
+    """
+
+    KEY_BYTES = 16
+
+    def __init__(self, model_name: str, dimension: int, root: Optional[Path] = None):
+        self.model_name = model_name
+        self.dimension = dimension
+        root = root or config.EMBEDDINGS_DIR / "cache"
+        root.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.vectors_path = root / f"{slug}.f32"
+        self.keys_path = root / f"{slug}.keys"
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(root / f"{slug}.lock")
+        self._rows: Dict[bytes, int] = {}
+        self._keys_read = 0
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        row_bytes = self.dimension * 4
+        # Exclusive: another process must not be mid-append while torn tails are cut off
+        with self._file_lock.hold():
+            vector_rows = self.vectors_path.stat().st_size // row_bytes if self.vectors_path.exists() else 0
+            keys = self.keys_path.read_bytes() if self.keys_path.exists() else b""
+            key_rows = len(keys) // self.KEY_BYTES
+
+            # Vectors are written before keys, so a torn write leaves extra vectors, never extra keys
+            count = min(vector_rows, key_rows)
+            if key_rows != count or len(keys) != count * self.KEY_BYTES:
+                with open(self.keys_path, 'r+b') as f:
+                    f.truncate(count * self.KEY_BYTES)
+            if vector_rows != count:
+                with open(self.vectors_path, 'r+b') as f:
+                    f.truncate(count * row_bytes)
+
+        self._add_keys(keys[:count * self.KEY_BYTES])
+        logger.info("Embedding cache: %d cached vectors for %s", count, self.model_name)
+
+    def _add_keys(self, keys: bytes):
+        for offset in range(0, len(keys) - len(keys) % self.KEY_BYTES, self.KEY_BYTES):
+            self._rows.setdefault(keys[offset:offset + self.KEY_BYTES], self._keys_read)
+            self._keys_read += 1
+
+    def _catch_up(self):
+        """Index rows appended by other processes since we last read the key file (call with _lock held)"""
+        size = self.keys_path.stat().st_size if self.keys_path.exists() else 0
+        if size < (self._keys_read + 1) * self.KEY_BYTES:
+            return
+        with open(self.keys_path, 'rb') as f:
+            f.seek(self._keys_read * self.KEY_BYTES)
+            self._add_keys(f.read(size - self._keys_read * self.KEY_BYTES))
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(
+            f"{self.model_name}\0{text}".encode("utf-8"), digest_size=self.KEY_BYTES
+        ).digest()
+
+    def _mapped(self, rows: int) -> np.ndarray:
+        if self._matrix is None or self._matrix.shape[0] < rows:
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode='r', shape=(self._keys_read, self.dimension)
+            )
+        return self._matrix
+
+    def lookup(self, keys: List[bytes]) -> Tuple[np.ndarray, List[int]]:
+        """Return (matrix with cached rows filled in, indexes of the keys that missed)"""
+        result = np.zeros((len(keys), self.dimension), dtype=np.float32)
+        missing = []
+        with self._lock:
+            if any(k not in self._rows for k in keys):
+                self._catch_up()
+            found = [(i, self._rows.get(k)) for i, k in enumerate(keys)]
+            hit_rows = [(i, row) for i, row in found if row is not None]
+            if hit_rows:
+                matrix = self._mapped(max(row for _, row in hit_rows) + 1)
+                positions, rows = zip(*hit_rows)
+                result[list(positions)] = matrix[list(rows)]
+            missing = [i for i, row in found if row is None]
+            self.hits += len(hit_rows)
+            self.misses += len(missing)
+        return result, missing
+
+    def store(self, keys: List[bytes], embeddings: np.ndarray):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock, self._file_lock.hold():
+            # Row numbers are file positions, so first account for everything other processes appended
+            self._catch_up()
+            new = []
+            seen = set()
+            for i, k in enumerate(keys):
+                if k not in self._rows and k not in seen:
+                    seen.add(k)
+                    new.append(i)
+            if not new:
+                return
+            # Cut off the tail of an append that died between its vectors and keys, which would
+            # otherwise shift every row written after it
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(self._keys_read * self.dimension * 4)
+                f.write(embeddings[new].tobytes())
+            with open(self.keys_path, 'ab') as f:
+                f.truncate(self._keys_read * self.KEY_BYTES)
+                f.write(b"".join(keys[i] for i in new))
+            self._add_keys(b"".join(keys[i] for i in new))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": len(self._rows),
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -1,25 +1,259 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Tuple, Callable
+import asyncio
+import logging
+import threading
+import time
+import numpy as np
+from embedding_backends import create_embedding_backend
+from embedding_cache import EmbeddingDiskCache
 from config import config
 
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU cache of query embeddings keyed on (model, normalized text)"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key: Tuple[str, str], embedding: List[float]):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+class QueryBatcher:
+    """Coalesces concurrent single-query encodes into one batched encode.
+
+    The first waiting query opens a window of QUERY_BATCH_WINDOW_MS; everything that arrives
+    before it closes (up to QUERY_BATCH_MAX texts) is encoded together and fanned back out.
+    Async callers should use asubmit(): a caller blocked in submit() holds a pool thread for the
+    whole window, which caps a batch at the pool size.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]], window_ms: float, max_size: int):
+        self.encode = encode
+        self.window = window_ms / 1000.0
+        self.max_size = max(max_size, 1)
+        self._pending: "OrderedDict[str, List[Future]]" = OrderedDict()
+        self._count = 0
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self.batches = 0
+        self.queries = 0
+
+    def submit(self, text: str) -> List[float]:
+        return self._enqueue(text).result()
+
+    async def asubmit(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._enqueue(text))
+
+    def _enqueue(self, text: str) -> Future:
+        future = Future()
+        with self._cond:
+            self._pending.setdefault(text, []).append(future)
+            self._count += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="docsearch-query-batcher", daemon=True)
+                self._worker.start()
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.window
+                while self._count < self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = []
+                while self._pending and len(batch) < self.max_size:
+                    text, futures = self._pending.popitem(last=False)
+                    self._count -= len(futures)
+                    batch.append((text, futures))
+                self.batches += 1
+                self.queries += sum(len(futures) for _, futures in batch)
+
+            try:
+                embeddings = self.encode([text for text, _ in batch])
+            except Exception as e:
+                for _, futures in batch:
+                    for future in futures:
+                        future.set_exception(e)
+                continue
+            for (_, futures), embedding in zip(batch, embeddings):
+                for future in futures:
+                    future.set_result(embedding)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_size,
+                "batches": self.batches,
+                "queries": self.queries,
+                "avg_batch_size": self.queries / self.batches if self.batches else 0.0
+            }
+
+
 class EmbeddingService:
     def __init__(self):
-        print(f"Loading embedding model: {config.EMBEDDING_MODEL}")
-        self.model = SentenceTransformer(config.EMBEDDING_MODEL)
-        self.dimension = self.model.get_sentence_embedding_dimension()
-        print(f"Model loaded. Dimension: {self.dimension}")
+        logger.info("Loading embedding model: %s (%s)", config.EMBEDDING_MODEL, config.EMBEDDING_BACKEND)
+        self.backend = create_embedding_backend()
+        # Distinguishes vectors from different backends (e.g. int8 ONNX) in caches and index signatures
+        self.model_id = self.backend.name
+        self.dimension = self.backend.dimension
+        self.query_cache = QueryEmbeddingCache(config.QUERY_CACHE_SIZE)
+        self.batcher = (
+            QueryBatcher(self._encode_queries, config.QUERY_BATCH_WINDOW_MS, config.QUERY_BATCH_MAX)
+            if config.QUERY_BATCH_WINDOW_MS > 0 else None
+        )
+        self.disk_cache = (
+            EmbeddingDiskCache(self.model_id, self.dimension)
+            if config.EMBEDDING_CACHE_ENABLED else None
+        )
+        logger.info("Model loaded. Dimension: %d", self.dimension)
+
+    def warm_up(self):
+        """Run one throwaway encode so the first real query doesn't pay for lazy initialization"""
+        self.backend.encode(["warm up"])
+        self.backend.count_tokens(["warm up"])
 
     def embed_text(self, text: str) -> List[float]:
+        text = QueryEmbeddingCache.normalize(text) if text else text
         if not text:
             return [0.0] * self.dimension
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+
+        key = (self.model_id, text)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if self.batcher is not None:
+            embedding = self.batcher.submit(text)
+        else:
+            embedding = self.backend.encode([text])[0].tolist()
+        self.query_cache.put(key, embedding)
+        return embedding
+
+    async def aembed_text(self, text: str) -> List[float]:
+        """embed_text() for the event loop; waits on the batcher without holding a thread. Requires the batcher."""
+        text = QueryEmbeddingCache.normalize(text) if text else text
+        if not text:
+            return [0.0] * self.dimension
+
+        key = (self.model_id, text)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+
+        embedding = await self.batcher.asubmit(text)
+        self.query_cache.put(key, embedding)
+        return embedding
+
+    def _encode_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.backend.encode(texts).tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """embed_text() for many queries: LRU hits are reused and all misses share one encode call"""
+        texts = [QueryEmbeddingCache.normalize(text) if text else text for text in texts]
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        missing = {}
+        for i, text in enumerate(texts):
+            if not text:
+                embeddings[i] = [0.0] * self.dimension
+                continue
+            cached = self.query_cache.get((self.model_id, text))
+            if cached is not None:
+                embeddings[i] = cached
+            else:
+                missing.setdefault(text, []).append(i)
+
+        if missing:
+            encoded = self._encode_queries(list(missing))
+            for (text, positions), embedding in zip(missing.items(), encoded):
+                self.query_cache.put((self.model_id, text), embedding)
+                for i in positions:
+                    embeddings[i] = embedding
+        return embeddings
 
     def embed_batch(self, texts: List[str]) -> List[List[float]]:
         if not texts:
             return []
-        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-        return embeddings.tolist()
+        return self.embed_batch_array(texts).tolist()
+
+    def embed_batch_array(self, texts: List[str]) -> np.ndarray:
+        """Batch encode to a contiguous (n, dim) float32 matrix, encoding only disk-cache misses"""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        if self.disk_cache is None:
+            return self._encode(texts)
+
+        keys = [self.disk_cache.key(text) for text in texts]
+        embeddings, missing = self.disk_cache.lookup(keys)
+        if missing:
+            encoded = self._encode([texts[i] for i in missing])
+            embeddings[missing] = encoded
+            self.disk_cache.store([keys[i] for i in missing], encoded)
+        return embeddings
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.backend.encode(texts, show_progress_bar=True)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Tokenizer token counts without [CLS]/[SEP], for sizing chunks to the model's input limit"""
+        if not texts:
+            return []
+        return self.backend.count_tokens(texts)
 
     def get_dimension(self) -> int:
         return self.dimension
+
+    def cache_stats(self) -> Dict:
+        return self.query_cache.stats()
+
+    def batcher_stats(self) -> Dict:
+        return self.batcher.stats() if self.batcher else {}
+
+    def disk_cache_stats(self) -> Dict:
+        return self.disk_cache.stats() if self.disk_cache else {}
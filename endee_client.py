@@ -1,7 +1,23 @@
+import logging
+import asyncio
+import threading
+import time
 import requests
+import httpx
 import msgpack
-from typing import List, Dict
+import numpy as np
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import quote
 from config import config
+from metrics import count_endee_error
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying for idempotent calls (Endee restarting or overloaded)
+RETRY_STATUSES = {502, 503, 504}
+
 
 class EndeeClient:
     def __init__(self):
@@ -9,49 +25,161 @@ class EndeeClient:
         self.headers = {"Content-Type": "application/json"}
         if config.ENDEE_AUTH_TOKEN:
             self.headers["Authorization"] = config.ENDEE_AUTH_TOKEN
-        print(f"Connecting to Endee at {self.base_url}")
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=config.ENDEE_MAX_CONNECTIONS
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "async_requests": 0, "async_connections": 0}
+        logger.info("Connecting to Endee at %s", self.base_url)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop, then reused for keep-alive
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=httpx.Limits(
+                    max_connections=config.ENDEE_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.ENDEE_MAX_CONNECTIONS
+                )
+            )
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    @staticmethod
+    def _timeout(operation: str) -> Tuple[float, float]:
+        read_timeouts = {
+            "search": config.ENDEE_SEARCH_TIMEOUT,
+            "insert": config.ENDEE_INSERT_TIMEOUT,
+        }
+        return config.ENDEE_CONNECT_TIMEOUT, read_timeouts.get(operation, config.ENDEE_READ_TIMEOUT)
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    @staticmethod
+    def _error(operation: str, message: str, *args):
+        count_endee_error(operation)
+        logger.error(message, *args)
+
+    def _request(self, method: str, path: str, operation: str,
+                 idempotent: bool = False, **kwargs) -> requests.Response:
+        """Send a request on the pooled session, retrying idempotent calls with backoff"""
+        attempts = 1 + (config.ENDEE_MAX_RETRIES if idempotent else 0)
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                self._count("requests")
+                response = self.session.request(
+                    method, f"{self.base_url}{path}", timeout=self._timeout(operation), **kwargs
+                )
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+            self._count("retries")
+            time.sleep(config.ENDEE_RETRY_BACKOFF * (2 ** attempt))
+
+    async def _arequest(self, method: str, path: str, operation: str,
+                        idempotent: bool = False, **kwargs) -> httpx.Response:
+        attempts = 1 + (config.ENDEE_MAX_RETRIES if idempotent else 0)
+        connect, read = self._timeout(operation)
+        timeout = httpx.Timeout(read, connect=connect)
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                self._count("async_requests")
+                response = await self._get_async_client().request(
+                    method, path, timeout=timeout,
+                    extensions={"trace": self._trace_connections}, **kwargs
+                )
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+            except (httpx.TransportError, httpx.TimeoutException):
+                if last_attempt:
+                    raise
+            self._count("retries")
+            await asyncio.sleep(config.ENDEE_RETRY_BACKOFF * (2 ** attempt))
+
+    async def _trace_connections(self, event_name: str, info: Dict):
+        if event_name == "connection.connect_tcp.started":
+            self._count("async_connections")
+
+    def connection_stats(self) -> Dict:
+        """Requests vs. new TCP connections; reused > 0 means keep-alive is working"""
+        connections = 0
+        pools = self.session.get_adapter(self.base_url).poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            "requests": stats["requests"],
+            "connections": connections,
+            "reused": max(stats["requests"] - connections, 0),
+            "async_requests": stats["async_requests"],
+            "async_connections": stats["async_connections"],
+            "async_reused": max(stats["async_requests"] - stats["async_connections"], 0),
+            "retries": stats["retries"]
+        }
+
+    def stats(self) -> Dict:
+        return {"backend": "endee", "connections": self.connection_stats()}
 
     def create_index(self, index_name: str, dimension: int, metric: str = "cosine") -> Dict:
-        url = f"{self.base_url}/api/v1/index/create"
         payload = {
             "index_name": index_name,
             "dim": dimension,
             "space_type": metric
         }
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            print(f"Create index response: {response.status_code} - {response.text[:300]}")
+            response = self._request("POST", "/api/v1/index/create", "create", json=payload)
             if response.status_code == 200:
-                print(f"Index '{index_name}' created successfully")
+                logger.info("Index '%s' created successfully", index_name)
                 return {"status": "created"}
             else:
-                print(f"Error creating index: {response.text}")
+                self._error("create", "Error creating index: %s - %s", response.status_code, response.text[:300])
                 return {}
         except Exception as e:
-            print(f"Error: {e}")
+            self._error("create", "Error creating index: %s", e)
             return {}
 
     def list_indices(self) -> List[str]:
-        url = f"{self.base_url}/api/v1/index/list"
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self._request("GET", "/api/v1/index/list", "list", idempotent=True)
             if response.status_code == 200:
                 data = response.json()
                 indexes = data.get("indexes", [])
                 return [idx["name"] for idx in indexes]
+            self._error("list", "Error listing indexes: %s - %s", response.status_code, response.text[:300])
         except Exception as e:
-            print(f"Error: {e}")
+            self._error("list", "Error listing indexes: %s", e)
         return []
 
     def index_exists(self, index_name: str) -> bool:
         names = self.list_indices()
-        print(f"Existing indexes: {names}")
+        logger.debug("Existing indexes: %s", names)
         return index_name in names
 
     def insert_vectors(self, index_name: str, vectors: List[Dict]) -> Dict:
         """Insert vectors - sends as JSON list directly"""
-        url = f"{self.base_url}/api/v1/index/{index_name}/vector/insert"
-
         # API expects a JSON list of objects: [{"id": ..., "vector": [...]}, ...]
         payload = []
         for v in vectors:
@@ -61,42 +189,109 @@ class EndeeClient:
             }
             payload.append(item)
 
+        return self._insert(index_name, len(payload), json=payload)
+
+    def insert_array(self, index_name: str, ids: List[str], embeddings: np.ndarray) -> Dict:
+        """Insert rows of a float32 matrix without materializing per-float Python objects"""
+        embeddings = np.ascontiguousarray(embeddings, dtype="<f4")
+        if config.ENDEE_INSERT_FORMAT != "msgpack":
+            vectors = [{"id": vid, "vector": row.tolist()} for vid, row in zip(ids, embeddings)]
+            return self.insert_vectors(index_name, vectors)
+
+        # Each vector travels as a packed little-endian float32 buffer (msgpack bin)
+        body = msgpack.packb(
+            [{"id": str(vid), "vector": row.tobytes()} for vid, row in zip(ids, embeddings)],
+            use_bin_type=True
+        )
+        return self._insert(
+            index_name, len(ids), data=body, headers={"Content-Type": "application/msgpack"}
+        )
+
+    def _insert(self, index_name: str, count: int, **kwargs) -> Dict:
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            print(f"Insert response: {response.status_code}")
+            response = self._request(
+                "POST", f"/api/v1/index/{index_name}/vector/insert", "insert", **kwargs
+            )
             if response.status_code == 200:
-                print(f"Inserted {len(vectors)} vectors successfully")
-                return {"status": "inserted", "count": len(vectors)}
+                logger.debug("Inserted %d vectors", count)
+                return {"status": "inserted", "count": count}
             else:
-                print(f"Insert error: {response.status_code} - {response.text[:300]}")
+                self._error("insert", "Insert error: %s - %s", response.status_code, response.text[:300])
                 return {}
         except Exception as e:
-            print(f"Error: {e}")
+            self._error("insert", "Insert error: %s", e)
             return {}
 
+    def delete_vectors(self, index_name: str, vector_ids: List[str]) -> Dict:
+        """Delete vectors by id, fanning the per-id calls out over the keep-alive pool"""
+        if not vector_ids:
+            return {"status": "deleted", "count": 0, "failed": []}
+        workers = min(len(vector_ids), config.ENDEE_MAX_CONNECTIONS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="endee-delete") as pool:
+            results = list(pool.map(lambda vid: self._delete_one(index_name, vid), vector_ids))
+        failed = [vid for vid, ok in zip(vector_ids, results) if not ok]
+        deleted = len(vector_ids) - len(failed)
+        logger.info("Deleted %d vectors", deleted)
+        return {"status": "deleted", "count": deleted, "failed": failed}
+
+    def _delete_one(self, index_name: str, vector_id: str) -> bool:
+        try:
+            response = self._request(
+                "DELETE", f"/api/v1/index/{index_name}/vector/{quote(str(vector_id), safe='')}/delete",
+                "delete", idempotent=True
+            )
+            if response.status_code in (200, 404):
+                return True
+            self._error("delete", "Delete error: %s - %s", response.status_code, response.text[:300])
+        except Exception as e:
+            self._error("delete", "Delete error: %s", e)
+        return False
+
     def search(self, index_name: str, query_vector: List[float], top_k: int = 5) -> Dict:
         """Search - returns msgpack decoded results"""
-        url = f"{self.base_url}/api/v1/index/{index_name}/search"
         payload = {
             "vector": query_vector,
             "k": top_k
         }
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            print(f"Search response: {response.status_code}")
+            response = self._request(
+                "POST", f"/api/v1/index/{index_name}/search", "search", idempotent=True, json=payload
+            )
+            return self._parse_search_response(response)
+        except Exception as e:
+            self._error("search", "Search error: %s", e)
+            return {"results": []}
 
-            if response.status_code == 200:
-                content_type = response.headers.get('content-type', '')
-
-                if 'msgpack' in content_type:
-                    data = msgpack.unpackb(response.content, raw=False)
-                    print(f"Search returned {len(data)} results")
-                    return {"results": data}
-                else:
-                    return response.json()
-            else:
-                print(f"Search error: {response.text[:300]}")
-                return {"results": []}
+    async def asearch(self, index_name: str, query_vector: List[float], top_k: int = 5) -> Dict:
+        """Async search over a pooled keep-alive connection"""
+        payload = {
+            "vector": query_vector,
+            "k": top_k
+        }
+        try:
+            response = await self._arequest(
+                "POST", f"/api/v1/index/{index_name}/search", "search", idempotent=True, json=payload
+            )
+            return self._parse_search_response(response)
         except Exception as e:
-            print(f"Error: {e}")
+            self._error("search", "Search error: %s", e)
+            return {"results": []}
+
+    async def asearch_many(self, index_name: str, query_vectors: List[List[float]], top_k: int = 5) -> List[Dict]:
+        """Run one search per query concurrently over the shared connection pool, results in query order"""
+        return list(await asyncio.gather(
+            *(self.asearch(index_name, vector, top_k) for vector in query_vectors)
+        ))
+
+    def _parse_search_response(self, response) -> Dict:
+        if response.status_code == 200:
+            content_type = response.headers.get('content-type', '')
+
+            if 'msgpack' in content_type:
+                data = msgpack.unpackb(response.content, raw=False)
+                return {"results": data}
+            else:
+                return response.json()
+        else:
+            self._error("search", "Search error: %s - %s", response.status_code, response.text[:300])
             return {"results": []}
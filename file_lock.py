@@ -0,0 +1,51 @@
+from typing import Optional
+from contextlib import contextmanager
+from pathlib import Path
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover threads of one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """Advisory lock on a lock file that serializes this process's threads and excludes other processes.
+
+    Re-entrant within a thread; only the outermost hold() takes the flock. The file is opened on
+    first use, so an instance created before a fork is safe to use in every child.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._depth = 0
+        if fcntl is None:
+            logger.warning("fcntl is unavailable; %s only serializes threads of this process", self.path.name)
+
+    def _file(self) -> int:
+        if self._fd is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        return self._fd
+
+    @contextmanager
+    def hold(self, shared: bool = False):
+        """Hold the lock; `shared` lets other processes' shared holders in, but not writers"""
+        with self._lock:
+            if self._depth == 0 and fcntl is not None:
+                fcntl.flock(self._file(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and fcntl is not None:
+                    fcntl.flock(self._file(), fcntl.LOCK_UN)
@@ -0,0 +1,191 @@
+from typing import Dict, Optional, Callable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class IngestJob:
+    """Status of one background upload, updated by the worker as it moves through the stages"""
+
+    def __init__(self, file_path: str, replace: bool = False):
+        self.id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.replace = replace
+        self.filename = Path(file_path).name
+        self.stage = "queued"
+        self.progress = {
+            "extracted": False,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "vectors_inserted": 0
+        }
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def update(self, stage: Optional[str] = None, **progress):
+        with self._lock:
+            if stage:
+                self.stage = stage
+            for key, value in progress.items():
+                if key in ("chunks_embedded", "vectors_inserted"):
+                    self.progress[key] += value
+                else:
+                    self.progress[key] = value
+            self.updated_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ("done", "failed")
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "filename": self.filename,
+                "stage": self.stage,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at
+            }
+
+
+class JobStore:
+    """Job snapshots in SQLite, so a status poll answered by another worker process still finds the job"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use, i.e. inside the worker process, never in a parent that forks workers
+        if self._conn is None:
+            self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, finished INTEGER NOT NULL, "
+                    "updated_at REAL NOT NULL, record TEXT NOT NULL)"
+                )
+        return self._conn
+
+    def save(self, job: IngestJob):
+        snapshot = job.to_dict()
+        with self._lock, self._connection():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, finished, updated_at, record) VALUES (?, ?, ?, ?)",
+                (job.id, int(job.finished), snapshot["updated_at"], json.dumps(snapshot))
+            )
+            if job.finished:
+                self._conn.execute(
+                    "DELETE FROM jobs WHERE finished = 1 AND job_id NOT IN "
+                    "(SELECT job_id FROM jobs WHERE finished = 1 ORDER BY updated_at DESC LIMIT ?)",
+                    (config.INGEST_JOB_HISTORY,)
+                )
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection().execute("SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class IngestQueueFull(Exception):
+    pass
+
+
+class IngestQueue:
+    """Bounded worker pool for uploads, kept apart from the query executor so ingest can't starve search"""
+
+    def __init__(self, index_document: Callable[..., Dict], store: Optional[JobStore] = None):
+        self.index_document = index_document
+        self.store = store
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.INGEST_WORKERS,
+            thread_name_prefix="docsearch-ingest"
+        )
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_path: str, replace: bool = False) -> IngestJob:
+        job = IngestJob(file_path, replace)
+        with self._lock:
+            pending = sum(1 for j in self.jobs.values() if not j.finished)
+            if pending >= config.INGEST_MAX_PENDING:
+                raise IngestQueueFull(f"{pending} uploads already pending")
+            self.jobs[job.id] = job
+            self._prune()
+        self._save(job)
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Status of a job submitted to this process or, via the shared store, to another worker"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.store.load(job_id) if self.store is not None else None
+
+    def _save(self, job: IngestJob):
+        if self.store is None:
+            return
+        try:
+            self.store.save(job)
+        except sqlite3.Error as e:
+            logger.warning("Could not save status of job %s: %s", job.id, e)
+
+    def _run(self, job: IngestJob):
+        def progress(stage: Optional[str] = None, **counters):
+            changed = stage is not None and stage != job.stage
+            job.update(stage, **counters)
+            # Other workers only see stage transitions, not every per-batch counter update
+            if changed:
+                self._save(job)
+
+        try:
+            result = self.index_document(job.file_path, progress=progress, replace=job.replace)
+            if "error" in result:
+                job.error = result["error"]
+                job.update("failed")
+            else:
+                job.result = result
+                job.update("done")
+        except Exception as e:
+            logger.exception("Ingest job %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.update("failed")
+        self._save(job)
+
+    def _prune(self):
+        # Keep every unfinished job but only the most recent INGEST_JOB_HISTORY finished ones
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - config.INGEST_JOB_HISTORY, 0)]:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+        if self.store is not None:
+            self.store.close()
@@ -0,0 +1,164 @@
+from typing import List, Dict, Tuple, Iterable, Optional
+from array import array
+from collections import Counter
+import math
+import re
+import threading
+import numpy as np
+from config import config
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._@/-][a-z0-9]+)*")
+PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; identifiers like 18CS51, REF-2024-01 or emails also yield their parts"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(PART_PATTERN.findall(token))
+    return tokens
+
+
+class BM25Index:
+    """Incrementally maintained in-memory inverted index with BM25 scoring.
+
+    Each term maps to two compact arrays (doc numbers, term frequencies). Removed chunks are
+    tombstoned and their postings dropped in bulk once they make up a large share of the index.
+    Per-doc length norms are computed once per change to the index, not once per query.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_ids: List[str] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._doc_lengths = array('I')
+        self._total_length = 0
+        self._dead = 0
+        self._norms: Optional[np.ndarray] = None
+        self._alive: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def add(self, vector_id: str, text: str):
+        self.add_many([(vector_id, text)])
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        with self._lock:
+            for vector_id, text in items:
+                if vector_id in self._doc_numbers:
+                    self._remove(vector_id)
+                number = len(self._doc_ids)
+                self._doc_ids.append(vector_id)
+                self._doc_numbers[vector_id] = number
+
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                self._doc_lengths.append(length)
+                self._total_length += length
+                for term, tf in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array('I'), array('H'))
+                    postings[0].append(number)
+                    postings[1].append(min(tf, 0xFFFF))
+            self._norms = None
+            # Re-adding an id tombstones its old doc, so adds leave dead postings behind too
+            self._maybe_compact()
+
+    def remove_many(self, vector_ids: Iterable[str]):
+        with self._lock:
+            for vector_id in vector_ids:
+                self._remove(vector_id)
+            self._norms = None
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._dead > config.LEXICAL_COMPACT_RATIO * max(len(self._doc_ids), 1):
+            self._compact()
+
+    def _remove(self, vector_id: str):
+        number = self._doc_numbers.pop(vector_id, None)
+        if number is None:
+            return
+        self._total_length -= self._doc_lengths[number]
+        self._doc_lengths[number] = 0
+        self._doc_ids[number] = None
+        self._dead += 1
+
+    def _compact(self):
+        """Renumber live docs and drop tombstoned postings"""
+        remap = np.full(len(self._doc_ids), -1, dtype=np.int64)
+        live = [i for i, vid in enumerate(self._doc_ids) if vid is not None]
+        remap[live] = np.arange(len(live))
+
+        postings = {}
+        for term, (docs, tfs) in self._postings.items():
+            docs_np = np.frombuffer(docs, dtype=np.uint32)
+            keep = remap[docs_np] >= 0
+            if keep.any():
+                postings[term] = (
+                    array('I', remap[docs_np[keep]].astype(np.uint32).tobytes()),
+                    array('H', np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes())
+                )
+        self._postings = postings
+        self._doc_ids = [self._doc_ids[i] for i in live]
+        self._doc_numbers = {vid: i for i, vid in enumerate(self._doc_ids)}
+        self._doc_lengths = array('I', (self._doc_lengths[i] for i in live))
+        self._dead = 0
+        self._norms = None
+
+    def _doc_norms(self) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 length norm and alive flag per doc number (call with _lock held)"""
+        if self._norms is None:
+            lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32).astype(np.float32)
+            avg_length = self._total_length / max(len(self._doc_numbers), 1)
+            self._norms = self.k1 * (1 - self.b + self.b * lengths / max(avg_length, 1e-9))
+            # Removal zeroes a doc's length; a live doc of length 0 has no postings, so it never matches anyway
+            self._alive = lengths > 0
+        return self._norms, self._alive
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[float, str]]:
+        """Top-k (score, vector id) pairs for the query, best first.
+
+        Scores are BM25 divided by the highest BM25 any chunk could reach for the matched query
+        terms (every term with unbounded frequency), so they fall in [0, 1) and compare across queries.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            doc_count = len(self._doc_numbers)
+            if not terms or not doc_count or top_k <= 0:
+                return []
+            norms, alive = self._doc_norms()
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+            ceiling = 0.0
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                # Copies, not views: a live view would block later appends to the posting arrays
+                docs = np.frombuffer(postings[0], dtype=np.uint32).astype(np.intp)
+                tfs = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                # Tombstoned postings linger until compaction; counting them could push idf below zero
+                df = int(alive[docs].sum())
+                if not df:
+                    continue
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norms[docs])
+                ceiling += idf * (self.k1 + 1)
+
+            # Skip tombstoned docs whose postings haven't been compacted away yet
+            matched = np.flatnonzero((scores > 0) & alive)
+            if not len(matched):
+                return []
+            k = min(top_k, len(matched))
+            top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[i]) / ceiling, self._doc_ids[i]) for i in top]
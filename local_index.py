@@ -0,0 +1,249 @@
+from typing import List, Dict, Optional
+from pathlib import Path
+import logging
+import asyncio
+import json
+import os
+import threading
+import numpy as np
+from file_lock import FileLock
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVectorIndex:
+    """In-process drop-in for EndeeClient: memory-mapped float32 rows with brute-force top-k.
+
+    Several worker processes may share one root: writes hold an exclusive file lock, reads a shared
+    one, and an index is reloaded whenever its id file was changed by another process.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or config.EMBEDDINGS_DIR / "local_index"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(self.root / "index.lock")
+        self._indexes: Dict[str, Dict] = {}
+        logger.info("Using local vector index at %s", self.root)
+
+    def _paths(self, index_name: str) -> Dict[str, Path]:
+        return {
+            "meta": self.root / f"{index_name}.meta.json",
+            "matrix": self.root / f"{index_name}.f32",
+            "ids": self.root / f"{index_name}.ids",
+        }
+
+    @staticmethod
+    def _version(path: Path):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _open(self, index_name: str) -> Optional[Dict]:
+        """Load the matrix and id list of an index, again if another process has changed it since"""
+        paths = self._paths(index_name)
+        index = self._indexes.get(index_name)
+        if index is not None and index["version"] == self._version(paths["ids"]):
+            return index
+        if not paths["meta"].exists():
+            return None
+
+        with open(paths["meta"], 'r') as f:
+            meta = json.load(f)
+        ids = []
+        if paths["ids"].exists():
+            with open(paths["ids"], 'r', encoding='utf-8') as f:
+                ids = [line.rstrip("\n") for line in f]
+
+        index = {
+            "dim": meta["dim"],
+            "metric": meta["metric"],
+            "ids": ids,
+            "positions": {vid: i for i, vid in enumerate(ids)},
+            "matrix": None,
+            "version": self._version(paths["ids"]),
+        }
+        self._map_matrix(index_name, index, max(len(ids), self.INITIAL_CAPACITY))
+        self._indexes[index_name] = index
+        return index
+
+    def _map_matrix(self, index_name: str, index: Dict, capacity: int):
+        if index["matrix"] is not None:
+            index["matrix"].flush()
+        path = self._paths(index_name)["matrix"]
+        row_bytes = index["dim"] * 4
+        current = path.stat().st_size // row_bytes if path.exists() else 0
+        if current < capacity:
+            with open(path, 'ab') as f:
+                f.truncate(capacity * row_bytes)
+        else:
+            capacity = current
+        index["matrix"] = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, index["dim"]))
+
+    def create_index(self, index_name: str, dimension: int, metric: str = "cosine") -> Dict:
+        if metric not in ("cosine", "ip"):
+            logger.error("Error creating index: unsupported metric %s", metric)
+            return {}
+        with self._lock, self._file_lock.hold():
+            paths = self._paths(index_name)
+            if not paths["meta"].exists():
+                with open(paths["meta"], 'w') as f:
+                    json.dump({"dim": dimension, "metric": metric}, f)
+            self._open(index_name)
+        logger.info("Index '%s' created successfully", index_name)
+        return {"status": "created"}
+
+    def list_indices(self) -> List[str]:
+        return sorted(p.name[:-len(".meta.json")] for p in self.root.glob("*.meta.json"))
+
+    def index_exists(self, index_name: str) -> bool:
+        names = self.list_indices()
+        logger.debug("Existing indexes: %s", names)
+        return index_name in names
+
+    def insert_vectors(self, index_name: str, vectors: List[Dict]) -> Dict:
+        ids = [str(v["id"]) for v in vectors]
+        embeddings = np.asarray([v["vector"] for v in vectors], dtype=np.float32)
+        return self.insert_array(index_name, ids, embeddings)
+
+    def insert_array(self, index_name: str, ids: List[str], embeddings: np.ndarray) -> Dict:
+        """Upsert rows; existing ids are overwritten in place, new ids are appended"""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        with self._lock, self._file_lock.hold():
+            index = self._open(index_name)
+            if index is None:
+                logger.error("Insert error: index '%s' does not exist", index_name)
+                return {}
+            if index["metric"] == "cosine":
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                embeddings = embeddings / np.maximum(norms, 1e-12)
+
+            new_ids = []
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, vid in enumerate(ids):
+                vid = str(vid)
+                position = index["positions"].get(vid)
+                if position is None:
+                    position = len(index["ids"]) + len(new_ids)
+                    index["positions"][vid] = position
+                    new_ids.append(vid)
+                rows[i] = position
+
+            needed = len(index["ids"]) + len(new_ids)
+            if needed > index["matrix"].shape[0]:
+                self._map_matrix(index_name, index, max(needed, index["matrix"].shape[0] * 2))
+
+            index["matrix"][rows] = embeddings
+            index["matrix"].flush()
+            # Ids are appended only after their rows are on disk, so the id file defines the count
+            if new_ids:
+                ids_path = self._paths(index_name)["ids"]
+                with open(ids_path, 'a', encoding='utf-8') as f:
+                    f.write("".join(f"{vid}\n" for vid in new_ids))
+                index["ids"].extend(new_ids)
+                index["version"] = self._version(ids_path)
+
+        logger.debug("Inserted %d vectors", len(ids))
+        return {"status": "inserted", "count": len(ids)}
+
+    def delete_vectors(self, index_name: str, vector_ids: List[str]) -> Dict:
+        """Remove rows by moving the last row into each hole, then rewrite the id file once"""
+        deleted = 0
+        with self._lock, self._file_lock.hold():
+            index = self._open(index_name)
+            if index is None:
+                return {"status": "deleted", "count": 0, "failed": []}
+            ids, positions, matrix = index["ids"], index["positions"], index["matrix"]
+            for vector_id in vector_ids:
+                position = positions.pop(str(vector_id), None)
+                if position is None:
+                    continue
+                last = len(ids) - 1
+                if position != last:
+                    matrix[position] = matrix[last]
+                    ids[position] = ids[last]
+                    positions[ids[position]] = position
+                ids.pop()
+                deleted += 1
+
+            if deleted:
+                matrix.flush()
+                # Give disk back once the live rows fill less than a quarter of the file
+                capacity = max(len(ids) * 2, self.INITIAL_CAPACITY)
+                if matrix.shape[0] >= capacity * 2:
+                    index["matrix"] = None
+                    del matrix
+                    with open(self._paths(index_name)["matrix"], 'r+b') as f:
+                        f.truncate(capacity * index["dim"] * 4)
+                    self._map_matrix(index_name, index, capacity)
+                ids_path = self._paths(index_name)["ids"]
+                tmp_path = ids_path.with_suffix(".ids.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write("".join(f"{vid}\n" for vid in ids))
+                os.replace(tmp_path, ids_path)
+                index["version"] = self._version(ids_path)
+
+        logger.info("Deleted %d vectors", deleted)
+        return {"status": "deleted", "count": deleted, "failed": []}
+
+    def search(self, index_name: str, query_vector: List[float], top_k: int = 5) -> Dict:
+        with self._lock, self._file_lock.hold(shared=True):
+            index = self._open(index_name)
+            if index is None or not index["ids"] or top_k <= 0:
+                return {"results": []}
+            count = len(index["ids"])
+            query = np.asarray(query_vector, dtype=np.float32)
+            if index["metric"] == "cosine":
+                query = query / max(float(np.linalg.norm(query)), 1e-12)
+            scores = index["matrix"][:count] @ query
+            k = min(top_k, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            # Resolve ids before releasing the lock: inserts and deletes reorder the list in place
+            ids = index["ids"]
+            return {"results": [[float(scores[i]), ids[i]] for i in top]}
+
+    async def asearch(self, index_name: str, query_vector: List[float], top_k: int = 5) -> Dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.search, index_name, query_vector, top_k)
+
+    def search_many(self, index_name: str, query_vectors: List[List[float]], top_k: int = 5) -> List[Dict]:
+        """Score several queries with one matrix product over the index"""
+        with self._lock, self._file_lock.hold(shared=True):
+            index = self._open(index_name)
+            if index is None or not index["ids"] or top_k <= 0 or not query_vectors:
+                return [{"results": []} for _ in query_vectors]
+            count = len(index["ids"])
+            queries = np.asarray(query_vectors, dtype=np.float32)
+            if index["metric"] == "cosine":
+                queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            scores = queries @ index["matrix"][:count].T
+            k = min(top_k, count)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            ids = index["ids"]
+            results = []
+            for row, candidates in zip(scores, top):
+                candidates = candidates[np.argsort(-row[candidates])]
+                results.append({"results": [[float(row[i]), ids[i]] for i in candidates]})
+            return results
+
+    async def asearch_many(self, index_name: str, query_vectors: List[List[float]], top_k: int = 5) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.search_many, index_name, query_vectors, top_k)
+
+    async def aclose(self):
+        with self._lock:
+            for index in self._indexes.values():
+                index["matrix"].flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "local",
+                "indexes": {name: len(index["ids"]) for name, index in self._indexes.items()}
+            }
@@ -0,0 +1,25 @@
+import logging
+import random
+from config import config
+
+
+def configure_logging():
+    """Root logging setup from LOG_LEVEL; call once at process start"""
+    logging.basicConfig(
+        level=config.LOG_LEVEL.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    # httpx logs every request at INFO, which would put a line per Endee call on the query path
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def log_sampled(logger: logging.Logger, level: int, message: str, *args):
+    """Log a hot-path message for a LOG_SAMPLE_RATE fraction of calls.
+
+    Arguments are formatted lazily, so a disabled level costs one isEnabledFor() check.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if config.LOG_SAMPLE_RATE < 1.0 and random.random() >= config.LOG_SAMPLE_RATE:
+        return
+    logger.log(level, message, *args)
@@ -0,0 +1,144 @@
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+import threading
+import time
+import numpy as np
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache of final search/answer responses.
+
+    Keys carry the corpus generation they were computed against, so a response can never be
+    served for a different corpus version; bumping the generation also drops every entry.
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, capacity: int, ttl: float):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.ttl > 0
+
+    def get(self, generation: int, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get((generation, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[(generation, key)]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end((generation, key))
+            self.hits += 1
+            return value
+
+    def put(self, generation: int, key: Hashable, value: Any):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[(generation, key)] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end((generation, key))
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+class SemanticQueryCache:
+    """Result sets of recent queries, matched by embedding similarity instead of exact text.
+
+    Embeddings live in a fixed float32 ring buffer, so a lookup is one matrix-vector product.
+    Entries only match within the same scope (e.g. corpus generation and top_k).
+    """
+
+    def __init__(self, capacity: int, dim: int, threshold: float):
+        self.capacity = max(capacity, 0)
+        self.threshold = threshold
+        self.matrix = np.zeros((self.capacity, dim), dtype=np.float32)
+        self._scope_ids = np.full(self.capacity, -1, dtype=np.int64)
+        self._scopes: Dict[Hashable, int] = {}
+        self._values: List[Any] = [None] * self.capacity
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(self, scope: Hashable, embedding: Sequence[float]) -> Optional[Any]:
+        if self.capacity == 0:
+            return None
+        query = self._unit(embedding)
+        with self._lock:
+            scope_id = self._scopes.get(scope)
+            if scope_id is not None:
+                scores = np.where(self._scope_ids == scope_id, self.matrix @ query, -np.inf)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    return self._values[best]
+            self.misses += 1
+            return None
+
+    def put(self, scope: Hashable, embedding: Sequence[float], value: Any):
+        if self.capacity == 0:
+            return
+        query = self._unit(embedding)
+        with self._lock:
+            slot = self._next
+            self._next = (slot + 1) % self.capacity
+            self.matrix[slot] = query
+            self._scope_ids[slot] = self._scopes.setdefault(scope, len(self._scopes))
+            self._values[slot] = value
+
+    def clear(self):
+        with self._lock:
+            self._scope_ids.fill(-1)
+            self._scopes.clear()
+            self._values = [None] * self.capacity
+            self._next = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": int((self._scope_ids >= 0).sum()),
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -1,127 +1,505 @@
-from typing import List, Dict
-import json
+from typing import List, Dict, Optional, Callable, Iterable, Iterator, Tuple, Set
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import hashlib
+import itertools
+import logging
 import re
+import threading
+import time
 from document_processor import DocumentProcessor
 from embedding_service import EmbeddingService
 from endee_client import EndeeClient
+from local_index import LocalVectorIndex
+from chunk_store import create_chunk_store
+from lexical_index import BM25Index, tokenize
+from response_cache import ResponseCache, SemanticQueryCache
+from file_lock import FileLock
+from startup import Component, ServiceNotReady
+from metrics import stage_timer, register_collector
+from logs import log_sampled
 from config import config
 
+logger = logging.getLogger(__name__)
+
+
+def create_vector_backend():
+    """Endee server or the in-process index; both expose the same create/insert/search API"""
+    if config.VECTOR_BACKEND == "endee":
+        return EndeeClient()
+    if config.VECTOR_BACKEND == "local":
+        return LocalVectorIndex()
+    raise ValueError(f"Unsupported vector backend: {config.VECTOR_BACKEND}")
+
+
+SEARCH_MODES = ("vector", "hybrid", "lexical")
+# Document record fields returned by /documents; the rest is internal bookkeeping for re-indexing
+PUBLIC_DOCUMENT_FIELDS = ("path", "chunks")
+
+
+def _ignore_progress(stage: Optional[str] = None, **counters):
+    pass
+
+
+STOP_WORDS = frozenset({
+    'what', 'is', 'the', 'a', 'an', 'of', 'in', 'to', 'for',
+    'and', 'or', 'on', 'at', 'by', 'how', 'who', 'where',
+    'when', 'why', 'which', 'are', 'was', 'were', 'be', 'been',
+    'do', 'does', 'did', 'have', 'has', 'had', 'can', 'could',
+    'will', 'would', 'should', 'may', 'might', 'about', 'with',
+    'from', 'this', 'that', 'these', 'those', 'it', 'its'
+})
+SENTENCE_PATTERN = re.compile(r'[^.!?\n]+')
+
+
+def _sentence_spans(text: str) -> List[List]:
+    """[start, end, tokens] for each sentence longer than 10 chars, computed once at index time"""
+    spans = []
+    for match in SENTENCE_PATTERN.finditer(text):
+        sentence = match.group()
+        stripped = sentence.strip()
+        if len(stripped) > 10:
+            start = match.start() + len(sentence) - len(sentence.lstrip())
+            spans.append([start, start + len(stripped), sorted(set(tokenize(stripped)) - STOP_WORDS)])
+    return spans
+
+
+def _parse_hits(results: Dict) -> List[Tuple[float, str]]:
+    """Normalize vector backend results ([score, id] pairs or dicts) to (score, vector id) tuples"""
+    hits = []
+    for result in results.get("results", []):
+        if isinstance(result, (list, tuple)) and len(result) >= 2:
+            hits.append((float(result[0]), str(result[1])))
+        elif isinstance(result, dict):
+            score = float(result.get("score", result.get("distance", 0.0)))
+            hits.append((score, str(result.get("id", ""))))
+    return hits
+
+
+def _file_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _index_signature(model_id: str) -> str:
+    """Settings that change chunk text, vectors or where they live; a document indexed under other settings is re-done"""
+    if config.CHUNK_UNIT == "tokens":
+        chunking = f"tokens:{config.CHUNK_TOKENS}:{config.CHUNK_OVERLAP_TOKENS}"
+    else:
+        chunking = f"chars:{config.CHUNK_SIZE}:{config.CHUNK_OVERLAP}"
+    return f"{model_id}|{chunking}|{config.VECTOR_BACKEND}:{config.INDEX_NAME}"
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
 class SearchService:
+    """Document indexing and retrieval.
+
+    Construction is cheap; start() loads the embedding model, the vector index and the chunk store
+    concurrently in the background. Calls that need a component which is still loading raise
+    ServiceNotReady (async paths) or wait for it (blocking paths).
+    """
+
     def __init__(self):
         self.processor = DocumentProcessor()
-        self.embedder = EmbeddingService()
-        self.endee = EndeeClient()
-        self.metadata_file = config.DATA_DIR / "document_metadata.json"
-        self.chunks_store = config.DATA_DIR / "chunks_store.json"
-
+        self.embedder: Optional[EmbeddingService] = None
+        self.vector_db = None
+        self.chunk_store = None
+        self.lexical: Optional[BM25Index] = None
+        self.components = {name: Component(name) for name in ("embedder", "vector_index", "chunk_store")}
+        self.executor = ThreadPoolExecutor(
+            max_workers=config.EXECUTOR_WORKERS,
+            thread_name_prefix="docsearch-worker"
+        )
+        # Separate pool so in-flight inserts never wait behind the jobs that submit them
+        self.insert_pool = ThreadPoolExecutor(
+            max_workers=config.INSERT_MAX_IN_FLIGHT,
+            thread_name_prefix="docsearch-insert"
+        )
+        # Serializes corpus writes across threads and across worker processes sharing DATA_DIR
+        self._write_lock = FileLock(config.DATA_DIR / "index.lock")
+        # Local view of the shared corpus generation; final responses are cached per generation
+        self.generation = 0
+        # Position in the chunk store's changelog that self.lexical reflects
+        self._change_seq = 0
+        self._sync_lock = threading.Lock()
+        self._synced_at = 0.0
+        self.response_cache = ResponseCache(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL)
+        self.semantic_cache: Optional[SemanticQueryCache] = None
+        if config.SEMANTIC_CACHE_ENABLED:
+            self.semantic_cache = SemanticQueryCache(
+                config.SEMANTIC_CACHE_SIZE, config.VECTOR_DIMENSION, config.SEMANTIC_CACHE_THRESHOLD
+            )
+        register_collector(self._collect_metrics)
+
+    def start(self):
+        """Begin loading every component in the background (idempotent)"""
+        self.components["embedder"].start(self._load_embedder)
+        # Endee may be briefly down during a rolling restart; keep trying instead of failing the process
+        self.components["vector_index"].start(self._load_vector_index, retry=True)
+        self.components["chunk_store"].start(self._load_chunk_store)
+
+    def _load_embedder(self):
+        embedder = EmbeddingService()
+        embedder.warm_up()
+        self.embedder = embedder
+
+    def _load_vector_index(self):
+        if self.vector_db is None:
+            self.vector_db = create_vector_backend()
         self._init_index()
-        self._load_metadata()
-        self._load_chunks()
+
+    def _load_chunk_store(self):
+        # The write lock is only taken for the one-time JSON migrations, so a worker starting during
+        # another worker's ingest doesn't wait for it
+        chunk_store = create_chunk_store(self._write_lock)
+        generation, change_seq = chunk_store.generation(), chunk_store.change_seq()
+        lexical = self._build_lexical(chunk_store)
+        self.chunk_store, self.lexical, self.generation = chunk_store, lexical, generation
+        self._change_seq = change_seq
+        self._synced_at = time.monotonic()
+
+    @staticmethod
+    def _build_lexical(chunk_store) -> BM25Index:
+        lexical = BM25Index()
+        lexical.add_many((vid, record.get("text", "")) for vid, record in chunk_store.items())
+        return lexical
+
+    def _sync_due(self) -> bool:
+        return time.monotonic() - self._synced_at >= config.GENERATION_CHECK_INTERVAL
+
+    def _sync(self, force: bool = False):
+        """Catch up with corpus writes made by other worker processes.
+
+        Checks the shared generation at most every GENERATION_CHECK_INTERVAL seconds (always with
+        `force`); when it moved, the caches are dropped and the chunks named in the store's changelog
+        are re-read into the BM25 index. Only a worker that fell behind the trimmed log rebuilds it.
+        """
+        if self.chunk_store is None or (not force and not self._sync_due()):
+            return
+        with self._sync_lock:
+            self._synced_at = time.monotonic()
+            # Read before the chunks: a write landing in between only triggers another rebuild
+            generation = self.chunk_store.generation()
+            if generation == self.generation:
+                return
+            changes = self.chunk_store.changes_since(self._change_seq)
+            if changes is None:
+                logger.info("Corpus changed in another worker (generation %d -> %d), reloading",
+                            self.generation, generation)
+                change_seq = self.chunk_store.change_seq()
+                self.lexical = self._build_lexical(self.chunk_store)
+            else:
+                change_seq, vector_ids = changes
+                self._apply_changes(vector_ids)
+            self._clear_caches()
+            self.generation, self._change_seq = generation, change_seq
+
+    def _apply_changes(self, vector_ids: List[str]):
+        """Bring the BM25 entries of `vector_ids` in line with the chunk store"""
+        for start in range(0, len(vector_ids), 500):
+            batch = vector_ids[start:start + 500]
+            records = self.chunk_store.get_many(batch)
+            self.lexical.remove_many([vid for vid in batch if vid not in records])
+            self.lexical.add_many((vid, record.get("text", "")) for vid, record in records.items())
+
+    async def _async_sync(self):
+        if self.chunk_store is not None and self._sync_due():
+            await self.run_blocking(self._sync)
+
+    def _require(self, *names: str):
+        """Raise ServiceNotReady unless the named components (all by default) have loaded"""
+        self.start()
+        for name in names or self.components:
+            component = self.components[name]
+            if not component.ready:
+                component.wait(0)
+
+    def wait_ready(self, *names: str, timeout: Optional[float] = None):
+        """Block until the named components (all by default) have loaded, or raise ServiceNotReady"""
+        self.start()
+        timeout = config.STARTUP_WAIT_TIMEOUT if timeout is None else timeout
+        for name in names or self.components:
+            self.components[name].wait(timeout)
+
+    def readiness(self) -> Dict:
+        return {
+            "ready": all(c.ready for c in self.components.values()),
+            "components": {name: c.to_dict() for name, c in self.components.items()}
+        }
 
     def _init_index(self):
-        if not self.endee.index_exists(config.INDEX_NAME):
-            print(f"Creating index: {config.INDEX_NAME}")
-            self.endee.create_index(
+        if not self.vector_db.index_exists(config.INDEX_NAME):
+            logger.info("Creating index: %s", config.INDEX_NAME)
+            created = self.vector_db.create_index(
                 config.INDEX_NAME,
                 config.VECTOR_DIMENSION,
                 "cosine"
             )
+            if not created:
+                raise RuntimeError(f"Could not create index '{config.INDEX_NAME}'")
         else:
-            print(f"Index '{config.INDEX_NAME}' already exists")
-
-    def _load_metadata(self):
-        if self.metadata_file.exists():
-            with open(self.metadata_file, 'r') as f:
-                self.metadata = json.load(f)
-        else:
-            self.metadata = {"documents": {}}
-
-    def _save_metadata(self):
-        with open(self.metadata_file, 'w') as f:
-            json.dump(self.metadata, f, indent=2)
-
-    def _load_chunks(self):
-        if self.chunks_store.exists():
-            with open(self.chunks_store, 'r') as f:
-                self.chunks_data = json.load(f)
-        else:
-            self.chunks_data = {}
-
-    def _save_chunks(self):
-        with open(self.chunks_store, 'w') as f:
-            json.dump(self.chunks_data, f, indent=2)
-
-    def index_document(self, file_path: str) -> Dict:
-        result = self.processor.process_document(file_path)
-
-        if "error" in result:
+            logger.info("Index '%s' already exists", config.INDEX_NAME)
+
+    def index_document(self, file_path: str, progress: Optional[Callable[..., None]] = None,
+                       replace: bool = False) -> Dict:
+        """Extract, chunk, embed and insert a document; `progress(stage, **counters)` gets status updates.
+
+        With `replace`, everything indexed under the same filename is dropped first and the file is
+        indexed from scratch instead of incrementally.
+        """
+        progress = progress or _ignore_progress
+        self.wait_ready()
+        # Uploads run on worker threads and in other worker processes; serialize writes to the shared stores
+        with self._write_lock.hold():
+            self._sync(force=True)
+            result = None
+            try:
+                if replace:
+                    result = self._delete_document(Path(file_path).name)
+                    if "error" in result:
+                        return result
+                result = self._index_document(file_path, progress)
+                return result
+            finally:
+                # Also on failure: a partially indexed document may already be searchable
+                if result is None or result.get("status") != "unchanged":
+                    self._bump_generation()
+
+    def delete_document(self, filename: str) -> Dict:
+        """Remove a document's vectors, chunks, metadata and uploaded file"""
+        self._require("vector_index", "chunk_store")
+        with self._write_lock.hold():
+            self._sync(force=True)
+            document = self.chunk_store.get_document(filename)
+            if document is None:
+                return {"error": f"Document not found: {filename}"}
+            try:
+                result = self._delete_document(filename)
+            finally:
+                self._bump_generation()
+            if "error" in result:
+                return result
+
+            path = Path(document.get("path", ""))
+            if path.parent.resolve() == config.UPLOAD_DIR.resolve() and path.exists():
+                path.unlink()
             return result
 
-        filename = result['filename']
-        chunks = result['chunks']
+    def _bump_generation(self):
+        """Publish a corpus write to other workers and drop cached responses (called with _write_lock held)"""
+        with self._sync_lock:
+            self.generation = self.chunk_store.bump_generation()
+            # This worker's BM25 index already has its own writes
+            self._change_seq = self.chunk_store.change_seq()
+            self._clear_caches()
+
+    def _clear_caches(self):
+        self.response_cache.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+
+    def _response_key(self, endpoint: str, query: str, top_k: int, mode: str) -> Tuple[int, Tuple]:
+        # Read the generation before retrieving, so a write landing mid-request only orphans the entry
+        return self.generation, (endpoint, " ".join(query.split()), top_k, mode)
+
+    def _delete_document(self, filename: str) -> Dict:
+        document = self.chunk_store.get_document(filename) or {}
+        # Ids from the chunk store plus the positional range, in case either is incomplete
+        vector_ids = set(self.chunk_store.ids_for_document(filename))
+        vector_ids.update(f"{filename}_{i}" for i in range(document.get("chunks", 0)))
+        vector_ids = sorted(vector_ids)
+
+        failed = self._delete_vectors(vector_ids)
+        self.chunk_store.compact()
+        if failed:
+            # Keep the record and the chunks still in the vector index so deleting again retries them
+            logger.error("Deleting %s: %d of %d vectors could not be removed", filename, len(failed), len(vector_ids))
+            return {
+                "error": f"{len(failed)} of {len(vector_ids)} vectors could not be deleted; delete the document again to retry",
+                "vectors_failed": len(failed)
+            }
 
-        print(f"Generating embeddings for {len(chunks)} chunks...")
-        texts = [chunk['text'] for chunk in chunks]
-        embeddings = self.embedder.embed_batch(texts)
+        self.chunk_store.delete_document(filename)
 
-        vectors = []
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            vector_id = f"{filename}_{i}"
-            vectors.append({
-                "id": vector_id,
-                "vector": embedding
-            })
-            self.chunks_data[vector_id] = {
-                "text": chunk['text'],
+        logger.info("Deleted %s: %d vectors and chunks", filename, len(vector_ids))
+        return {
+            "status": "deleted",
+            "filename": filename,
+            "vectors_removed": len(vector_ids),
+            "chunks_removed": len(vector_ids)
+        }
+
+    def _delete_vectors(self, vector_ids: List[str]) -> List[str]:
+        """Delete vectors with their chunks and lexical entries; returns the ids the vector backend kept"""
+        failed = set(self.vector_db.delete_vectors(config.INDEX_NAME, vector_ids).get("failed", []))
+        removed = [vid for vid in vector_ids if vid not in failed]
+        self.chunk_store.delete_many(removed)
+        self.lexical.remove_many(removed)
+        return [vid for vid in vector_ids if vid in failed]
+
+    def _index_document(self, file_path: str, progress: Callable[..., None]) -> Dict:
+        filename = Path(file_path).name
+        previous = self.chunk_store.get_document(filename) or {}
+        content_hash = _file_hash(file_path)
+        signature = _index_signature(self.embedder.model_id)
+
+        if previous.get("content_hash") == content_hash and previous.get("signature") == signature:
+            logger.info("%s is unchanged, skipping", filename)
+            progress("saving", extracted=True, chunks_total=previous.get("chunks", 0))
+            return {
+                "status": "unchanged",
                 "filename": filename,
-                "chunk_id": i,
-                "total_chunks": len(chunks)
+                "chunks_indexed": previous.get("chunks", 0),
+                "chunks_changed": 0,
+                "chunks_removed": 0,
+                "vectors_inserted": 0
             }
 
-        print(f"Inserting {len(vectors)} vectors into Endee...")
-        insert_result = self.endee.insert_vectors(config.INDEX_NAME, vectors)
+        # Chunk hashes are only comparable when produced by the same chunker and model
+        old_hashes = previous.get("chunk_hashes", []) if previous.get("signature") == signature else []
+
+        progress("extracting")
+        token_counter = self.embedder.count_tokens if config.CHUNK_UNIT == "tokens" else None
+        chunks = self.processor.iter_document_chunks(file_path, token_counter)
+        chunk_hashes = []
+        changed = 0
+
+        def changed_chunks():
+            nonlocal changed
+            for chunk in chunks:
+                chunk_id = chunk['metadata']['chunk_id']
+                chunk_hash = _text_hash(chunk['text'])
+                chunk_hashes.append(chunk_hash)
+                progress("embedding", chunks_total=len(chunk_hashes))
+                if chunk_id < len(old_hashes) and old_hashes[chunk_id] == chunk_hash:
+                    continue
+                changed += 1
+                yield chunk
+
+        def batches():
+            # Only new or changed chunks are stored and embedded, batch by batch as extraction streams them in
+            for batch in _batched(changed_chunks(), config.INSERT_BATCH_SIZE):
+                records = {}
+                for chunk in batch:
+                    chunk_id = chunk['metadata']['chunk_id']
+                    records[f"{filename}_{chunk_id}"] = {
+                        "text": chunk['text'],
+                        "filename": filename,
+                        "chunk_id": chunk_id,
+                        "sentences": _sentence_spans(chunk['text'])
+                    }
+                self.chunk_store.put_many(records)
+                self.lexical.add_many((vid, record["text"]) for vid, record in records.items())
+                yield list(records), [record["text"] for record in records.values()]
+
+        inserted = self._embed_and_insert(batches(), progress)
+        total = len(chunk_hashes)
+        if total == 0:
+            return {"error": "No text extracted from document"}
+
+        if inserted < changed:
+            # Keep the hashes of the last successful run so a retry re-embeds every chunk that may be
+            # missing from the vector index; the count still covers the rows already stored for delete
+            self.chunk_store.put_document(filename, {
+                **previous,
+                "path": file_path,
+                "chunks": max(total, previous.get("chunks", 0)),
+                "content_hash": None
+            })
+            logger.error("Indexing %s: only %d of %d vectors were inserted", filename, inserted, changed)
+            return {"error": f"Only {inserted} of {changed} vectors were inserted; upload the file again to retry"}
+
+        progress("saving", extracted=True)
+        stale_ids = [f"{filename}_{i}" for i in range(total, previous.get("chunks", 0))]
+        if stale_ids and self._delete_vectors(stale_ids):
+            # Like a failed insert: keep the old count so delete still covers the leftovers, and force a retry
+            self.chunk_store.put_document(filename, {
+                **previous,
+                "path": file_path,
+                "chunks": previous.get("chunks", 0),
+                "content_hash": None
+            })
+            logger.error("Indexing %s: stale vectors past chunk %d could not be deleted", filename, total)
+            return {"error": "Old vectors of this document could not be deleted; upload the file again to retry"}
 
-        self.metadata["documents"][filename] = {
+        self.chunk_store.put_document(filename, {
             "path": file_path,
-            "chunks": len(chunks)
-        }
-        self._save_metadata()
-        self._save_chunks()
+            "chunks": total,
+            "content_hash": content_hash,
+            "signature": signature,
+            "chunk_hashes": chunk_hashes
+        })
 
         return {
             "status": "success",
             "filename": filename,
-            "chunks_indexed": len(chunks)
+            "chunks_indexed": total,
+            "chunks_changed": changed,
+            "chunks_removed": len(stale_ids),
+            "vectors_inserted": inserted
         }
 
-    def _extract_answer(self, query: str, text: str) -> str:
-        """Extract the most relevant sentences from text based on query"""
-        query_words = set(query.lower().split())
-        # Remove common words
-        stop_words = {'what', 'is', 'the', 'a', 'an', 'of', 'in', 'to', 'for',
-                      'and', 'or', 'on', 'at', 'by', 'how', 'who', 'where',
-                      'when', 'why', 'which', 'are', 'was', 'were', 'be', 'been',
-                      'do', 'does', 'did', 'have', 'has', 'had', 'can', 'could',
-                      'will', 'would', 'should', 'may', 'might', 'about', 'with',
-                      'from', 'this', 'that', 'these', 'those', 'it', 'its'}
-        query_keywords = query_words - stop_words
-
-        # Split into sentences
-        sentences = re.split(r'[.!?\n]+', text)
-        sentences = [s.strip() for s in sentences if s.strip() and len(s.strip()) > 10]
+    def _embed_and_insert(self, batches: Iterable[Tuple[List[str], List[str]]],
+                          progress: Optional[Callable[..., None]] = None) -> int:
+        """Embed batch N while batch N-1 is uploading, with at most INSERT_MAX_IN_FLIGHT requests pending"""
+        progress = progress or _ignore_progress
+        in_flight = deque()
+        inserted = 0
+
+        def drain_one() -> int:
+            count = in_flight.popleft().result().get("count", 0)
+            progress(vectors_inserted=count)
+            return count
+
+        for vector_ids, texts in batches:
+            with stage_timer("embed"):
+                embeddings = self.embedder.embed_batch_array(texts)
+            progress(chunks_embedded=len(texts))
+            while len(in_flight) >= config.INSERT_MAX_IN_FLIGHT:
+                inserted += drain_one()
+            in_flight.append(self.insert_pool.submit(self._insert_batch, vector_ids, embeddings))
+        while in_flight:
+            inserted += drain_one()
+        return inserted
+
+    def _insert_batch(self, vector_ids: List[str], embeddings) -> Dict:
+        with stage_timer("insert"):
+            return self.vector_db.insert_array(config.INDEX_NAME, vector_ids, embeddings)
+
+    def _extract_answer(self, query_keywords: Set[str], records: List[Dict]) -> str:
+        """Extract the most relevant sentences from the chunk records based on the query keywords"""
+        sentences = []
+        for record in records:
+            text = record.get("text", "")
+            # Chunks indexed before sentence data was stored are segmented on the fly
+            spans = record.get("sentences")
+            if spans is None:
+                spans = _sentence_spans(text)
+            sentences.extend((text[start:end], set(tokens)) for start, end, tokens in spans)
 
         if not sentences:
-            return text[:300]
+            return records[0].get("text", "")[:300]
 
         # Score each sentence by keyword overlap
-        scored = []
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
-            score = 0
-            for word in query_keywords:
-                if word in sentence_lower:
-                    score += 1
-            scored.append((score, sentence))
+        scored = [(len(query_keywords & tokens), sentence) for sentence, tokens in sentences]
 
         # Sort by score descending
         scored.sort(key=lambda x: x[0], reverse=True)
@@ -138,100 +516,278 @@ class SearchService:
                 break
 
         if not top_sentences:
-            return sentences[0] if sentences else text[:300]
+            return sentences[0][0]
 
         return '. '.join(top_sentences) + '.'
 
-    def search(self, query: str, top_k: int = 5) -> List[Dict]:
-        print(f"Searching: {query}")
-
-        query_embedding = self.embedder.embed_text(query)
-        results = self.endee.search(config.INDEX_NAME, query_embedding, top_k)
-
-        result_list = results.get("results", [])
-        print(f"Raw results from Endee: {result_list}")
+    def retrieve(self, query: str, top_k: int = 5, mode: Optional[str] = None) -> List[Dict]:
+        """Run one retrieval pass and hydrate the scored chunks.
+
+        `mode` is "vector" (embedding search), "lexical" (BM25 only, no model call) or "hybrid"
+        (both rankings fused with reciprocal rank fusion); it defaults to config.SEARCH_MODE.
+        """
+        mode = self._check_mode(mode)
+        if mode == "lexical":
+            self.wait_ready("chunk_store")
+            self._sync()
+            return self._hydrate(self._fuse([self._lexical_search(query, top_k)], top_k))
+
+        self.wait_ready()
+        self._sync()
+        scope = self._semantic_scope(top_k, mode)
+        query_embedding = self._embed_query(query)
+        cached = self._semantic_get(scope, query_embedding)
+        if cached is not None:
+            return cached
+        with stage_timer("vector_search"):
+            results = self.vector_db.search(config.INDEX_NAME, query_embedding, self._vector_k(top_k, mode))
+        hits = self._hydrate(self._rank_hits(query, top_k, mode, results))
+        return self._semantic_put(scope, query_embedding, hits)
+
+    async def aretrieve(self, query: str, top_k: int = 5, mode: Optional[str] = None) -> List[Dict]:
+        """Async retrieve(): encode on the worker pool, then search the vector backend without blocking"""
+        mode = self._check_mode(mode)
+        if mode == "lexical":
+            self._require("chunk_store")
+            await self._async_sync()
+            lexical_hits = await self.run_blocking(self._lexical_search, query, top_k)
+            return self._hydrate(self._fuse([lexical_hits], top_k))
+
+        self._require()
+        await self._async_sync()
+        scope = self._semantic_scope(top_k, mode)
+        query_embedding = await self._aembed_query(query)
+        cached = self._semantic_get(scope, query_embedding)
+        if cached is not None:
+            return cached
+        with stage_timer("vector_search"):
+            results = await self.vector_db.asearch(
+                config.INDEX_NAME, query_embedding, self._vector_k(top_k, mode)
+            )
+        hits = self._hydrate(await self._arank_hits(query, top_k, mode, results))
+        return self._semantic_put(scope, query_embedding, hits)
+
+    async def aretrieve_many(self, queries: List[str], top_k: int = 5,
+                             mode: Optional[str] = None) -> List[List[Dict]]:
+        """aretrieve() for a list of queries: one encode call, concurrent searches, results in query order"""
+        mode = self._check_mode(mode)
+        if mode == "lexical":
+            self._require("chunk_store")
+            await self._async_sync()
+            batches = await asyncio.gather(*(self.run_blocking(self._lexical_search, q, top_k) for q in queries))
+            return [self._hydrate(self._fuse([lexical_hits], top_k)) for lexical_hits in batches]
+
+        self._require()
+        await self._async_sync()
+        scope = self._semantic_scope(top_k, mode)
+        query_embeddings = await self.run_blocking(self._embed_queries, queries)
+        batches = [self._semantic_get(scope, embedding) for embedding in query_embeddings]
+        missing = [i for i, hits in enumerate(batches) if hits is None]
+        if missing:
+            with stage_timer("vector_search"):
+                results = await self.vector_db.asearch_many(
+                    config.INDEX_NAME, [query_embeddings[i] for i in missing], self._vector_k(top_k, mode)
+                )
+            for i, result in zip(missing, results):
+                hits = self._hydrate(await self._arank_hits(queries[i], top_k, mode, result))
+                batches[i] = self._semantic_put(scope, query_embeddings[i], hits)
+        return batches
+
+    def _semantic_scope(self, top_k: int, mode: str) -> Optional[Tuple]:
+        # Paraphrases only share a result set in pure vector mode; BM25 scores depend on the exact terms.
+        # The generation is read before searching, like the response cache key.
+        if self.semantic_cache is None or mode != "vector":
+            return None
+        return self.generation, top_k
+
+    def _semantic_get(self, scope: Optional[Tuple], query_embedding: List[float]) -> Optional[List[Dict]]:
+        if scope is None:
+            return None
+        return self.semantic_cache.get(scope, query_embedding)
+
+    def _semantic_put(self, scope: Optional[Tuple], query_embedding: List[float],
+                      hits: List[Dict]) -> List[Dict]:
+        if scope is not None:
+            self.semantic_cache.put(scope, query_embedding, hits)
+        return hits
+
+    def _embed_query(self, query: str) -> List[float]:
+        with stage_timer("query_encode"):
+            return self.embedder.embed_text(query)
+
+    async def _aembed_query(self, query: str) -> List[float]:
+        # Waiting callers must not sit on pool threads, or a batch could never outgrow the pool
+        if self.embedder.batcher is None:
+            return await self.run_blocking(self._embed_query, query)
+        with stage_timer("query_encode"):
+            return await self.embedder.aembed_text(query)
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        with stage_timer("query_encode"):
+            return self.embedder.embed_queries(queries)
+
+    def _lexical_search(self, query: str, top_k: int) -> List[Tuple[float, str]]:
+        with stage_timer("lexical_search"):
+            return self.lexical.search(query, top_k)
+
+    @staticmethod
+    def _check_mode(mode: Optional[str]) -> str:
+        mode = mode or config.SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {mode}")
+        return mode
+
+    @staticmethod
+    def _vector_k(top_k: int, mode: str) -> int:
+        return top_k * config.HYBRID_CANDIDATES if mode == "hybrid" else top_k
+
+    async def _arank_hits(self, query: str, top_k: int, mode: str, results: Dict) -> List[Tuple]:
+        # Hybrid ranking runs a BM25 search, which is CPU work that doesn't belong on the event loop
+        if mode == "hybrid":
+            return await self.run_blocking(self._rank_hits, query, top_k, mode, results)
+        return self._rank_hits(query, top_k, mode, results)
+
+    def _rank_hits(self, query: str, top_k: int, mode: str, results: Dict) -> List[Tuple]:
+        hits = _parse_hits(results)
+        if mode == "hybrid":
+            lexical_hits = self._lexical_search(query, top_k * config.HYBRID_CANDIDATES)
+            hits = self._fuse([hits, lexical_hits], top_k)
+        return hits
+
+    @staticmethod
+    def _fuse(rankings: List[List[Tuple[float, str]]], top_k: int) -> List[Tuple[float, str, float]]:
+        """Reciprocal rank fusion, scaled so a chunk ranked first in every list scores 1.0.
+
+        Returns (score, vector id, rrf score) ordered by the RRF score. `score` stays a relevance
+        score from the first ranking that has the chunk (cosine before normalized BM25), since the
+        rank-only RRF value says nothing about how well the best hit actually matches.
+        """
+        fused, scores = {}, {}
+        for ranking in rankings:
+            for rank, (score, vector_id) in enumerate(ranking, start=1):
+                fused[vector_id] = fused.get(vector_id, 0.0) + 1.0 / (config.RRF_K + rank)
+                scores.setdefault(vector_id, score)
+        scale = (config.RRF_K + 1) / len(rankings)
+        best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(scores[vector_id], vector_id, rrf * scale) for vector_id, rrf in best]
+
+    def _hydrate(self, hits: List[Tuple]) -> List[Dict]:
+        # One batched lookup for all hits instead of a store round-trip per result
+        with stage_timer("hydrate"):
+            records = self.chunk_store.get_many([hit[1] for hit in hits])
 
         formatted = []
-        for i, result in enumerate(result_list):
-            if isinstance(result, (list, tuple)) and len(result) >= 2:
-                score = float(result[0])
-                vector_id = str(result[1])
-            elif isinstance(result, dict):
-                score = float(result.get("score", result.get("distance", 0.0)))
-                vector_id = str(result.get("id", ""))
-            else:
-                continue
-
-            chunk_data = self.chunks_data.get(vector_id, {})
+        for i, (score, vector_id, *fused) in enumerate(hits):
+            chunk_data = records.get(vector_id, {})
             text = chunk_data.get("text", "")
             filename = chunk_data.get("filename", "unknown")
             chunk_id = chunk_data.get("chunk_id", 0)
 
             if text:
-                formatted.append({
+                result = {
                     "rank": i + 1,
                     "text": text,
                     "filename": filename,
                     "chunk_id": chunk_id,
                     "score": score
-                })
+                }
+                if fused:
+                    result["rrf_score"] = fused[0]
+                formatted.append(result)
 
         return formatted
 
-    def answer(self, query: str, top_k: int = 3) -> Dict:
-        """Generate a direct answer from the most relevant chunks"""
-        print(f"Answering: {query}")
-
-        query_embedding = self.embedder.embed_text(query)
-        results = self.endee.search(config.INDEX_NAME, query_embedding, top_k)
-
-        result_list = results.get("results", [])
-
-        if not result_list:
-            return {
-                "answer": "No relevant information found in the uploaded documents.",
-                "sources": [],
-                "confidence": 0.0
-            }
-
-        # Collect relevant chunks
-        chunks_found = []
-        for result in result_list:
-            if isinstance(result, (list, tuple)) and len(result) >= 2:
-                score = float(result[0])
-                vector_id = str(result[1])
-            elif isinstance(result, dict):
-                score = float(result.get("score", 0.0))
-                vector_id = str(result.get("id", ""))
-            else:
-                continue
-
-            chunk_data = self.chunks_data.get(vector_id, {})
-            text = chunk_data.get("text", "")
-            filename = chunk_data.get("filename", "unknown")
-
-            if text:
-                chunks_found.append({
-                    "text": text,
-                    "filename": filename,
-                    "score": score
-                })
-
+    def search(self, query: str, top_k: int = 5, mode: Optional[str] = None) -> List[Dict]:
+        """retrieve() behind the response cache; the returned list is shared and must not be mutated"""
+        log_sampled(logger, logging.INFO, "Searching: %s", query)
+        mode = self._check_mode(mode)
+        self._sync()
+        generation, key = self._response_key("search", query, top_k, mode)
+        results = self.response_cache.get(generation, key)
+        if results is None:
+            results = self.retrieve(query, top_k, mode)
+            self.response_cache.put(generation, key, results)
+        return results
+
+    async def asearch(self, query: str, top_k: int = 5, mode: Optional[str] = None) -> List[Dict]:
+        log_sampled(logger, logging.INFO, "Searching: %s", query)
+        mode = self._check_mode(mode)
+        await self._async_sync()
+        generation, key = self._response_key("search", query, top_k, mode)
+        results = self.response_cache.get(generation, key)
+        if results is None:
+            results = await self.aretrieve(query, top_k, mode)
+            self.response_cache.put(generation, key, results)
+        return results
+
+    async def asearch_many(self, queries: List[str], top_k: int = 5,
+                           mode: Optional[str] = None) -> List[List[Dict]]:
+        """asearch() for a list of queries; only the cache misses go through retrieval"""
+        log_sampled(logger, logging.INFO, "Searching batch of %d queries", len(queries))
+        mode = self._check_mode(mode)
+        await self._async_sync()
+        keys = [self._response_key("search", query, top_k, mode) for query in queries]
+        batches = [self.response_cache.get(generation, key) for generation, key in keys]
+        missing = [i for i, results in enumerate(batches) if results is None]
+        if missing:
+            fetched = await self.aretrieve_many([queries[i] for i in missing], top_k, mode)
+            for i, results in zip(missing, fetched):
+                batches[i] = results
+                self.response_cache.put(*keys[i], results)
+        return batches
+
+    def answer(self, query: str, top_k: int = 3, chunks: Optional[List[Dict]] = None,
+               mode: Optional[str] = None) -> Dict:
+        """Generate a direct answer from the most relevant chunks (reuses `chunks` from retrieve() if given).
+
+        Without `chunks` the whole response is served from the response cache when possible; the
+        returned dict is then shared and must not be mutated.
+        """
+        log_sampled(logger, logging.INFO, "Answering: %s", query)
+        if chunks is not None:
+            return self._build_answer(query, chunks)
+
+        mode = self._check_mode(mode)
+        self._sync()
+        generation, key = self._response_key("answer", query, top_k, mode)
+        result = self.response_cache.get(generation, key)
+        if result is None:
+            result = self._build_answer(query, self.retrieve(query, top_k, mode))
+            self.response_cache.put(generation, key, result)
+        return result
+
+    async def aanswer(self, query: str, top_k: int = 3, chunks: Optional[List[Dict]] = None,
+                      mode: Optional[str] = None) -> Dict:
+        if chunks is not None:
+            return self.answer(query, top_k, chunks=chunks)
+
+        log_sampled(logger, logging.INFO, "Answering: %s", query)
+        mode = self._check_mode(mode)
+        await self._async_sync()
+        generation, key = self._response_key("answer", query, top_k, mode)
+        result = self.response_cache.get(generation, key)
+        if result is None:
+            result = self._build_answer(query, await self.aretrieve(query, top_k, mode))
+            self.response_cache.put(generation, key, result)
+        return result
+
+    def _build_answer(self, query: str, chunks_found: List[Dict]) -> Dict:
         if not chunks_found:
             return {
-                "answer": "No relevant information found.",
+                "answer": "No relevant information found in the uploaded documents.",
                 "sources": [],
-                "confidence": 0.0
+                "confidence": 0.0,
+                "chunks": chunks_found
             }
 
-        # Build answer from top chunks
+        # Build answer from top chunks, combining two when the top score is low
         top_chunk = chunks_found[0]
-        answer_text = self._extract_answer(query, top_chunk["text"])
-
-        # If top score is low, combine multiple chunks
-        if top_chunk["score"] < 0.3 and len(chunks_found) > 1:
-            combined_text = " ".join([c["text"] for c in chunks_found[:2]])
-            answer_text = self._extract_answer(query, combined_text)
+        used = chunks_found[:2] if top_chunk["score"] < 0.3 and len(chunks_found) > 1 else chunks_found[:1]
+        with stage_timer("answer_extract"):
+            stored = self.chunk_store.get_many([f"{c['filename']}_{c['chunk_id']}" for c in used])
+            records = [stored.get(f"{c['filename']}_{c['chunk_id']}", c) for c in used]
+            query_keywords = set(tokenize(query)) - STOP_WORDS
+            answer_text = self._extract_answer(query_keywords, records)
 
         # Build source list
         sources = []
@@ -249,8 +805,58 @@ class SearchService:
         return {
             "answer": answer_text,
             "sources": sources,
-            "confidence": confidence
+            "confidence": confidence,
+            "chunks": chunks_found
         }
 
+    async def run_blocking(self, func: Callable, *args):
+        """Run CPU-bound or blocking work on the bounded worker pool instead of the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def aclose(self):
+        if self.vector_db is not None:
+            await self.vector_db.aclose()
+        self.executor.shutdown(wait=False)
+        self.insert_pool.shutdown(wait=False)
+        self.processor.shutdown()
+        if self.chunk_store is not None:
+            self.chunk_store.close()
+
     def get_documents(self) -> Dict:
-        return self.metadata.get("documents", {})
+        self._require("chunk_store")
+        return {
+            name: {field: record[field] for field in PUBLIC_DOCUMENT_FIELDS if field in record}
+            for name, record in self.chunk_store.documents().items()
+        }
+
+    def _collect_metrics(self):
+        """Cache and corpus gauges for /metrics, read from the components' own counters at scrape time"""
+        caches = []
+        if self.embedder is not None:
+            caches.append(("query_embedding", self.embedder.cache_stats()))
+            caches.append(("embedding_disk", self.embedder.disk_cache_stats()))
+        caches.append(("response", self.response_cache.stats()))
+        if self.semantic_cache is not None:
+            caches.append(("semantic", self.semantic_cache.stats()))
+        caches = [(name, stats) for name, stats in caches if stats]
+        yield ("docsearch_cache_hits_total", "counter", "Cache lookups that hit",
+               [({"cache": name}, stats["hits"]) for name, stats in caches])
+        yield ("docsearch_cache_misses_total", "counter", "Cache lookups that missed",
+               [({"cache": name}, stats["misses"]) for name, stats in caches])
+        if self.lexical is not None:
+            yield ("docsearch_indexed_chunks", "gauge", "Chunks in the lexical index", [({}, len(self.lexical))])
+        yield ("docsearch_component_ready", "gauge", "1 once a startup component has loaded",
+               [({"component": name}, int(c.ready)) for name, c in self.components.items()])
+
+    def get_stats(self) -> Dict:
+        embedder = self.embedder
+        return {
+            "query_embedding_cache": embedder.cache_stats() if embedder else {},
+            "query_batching": embedder.batcher_stats() if embedder else {},
+            "embedding_disk_cache": embedder.disk_cache_stats() if embedder else {},
+            "response_cache": {**self.response_cache.stats(), "corpus_generation": self.generation},
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache is not None else {},
+            "vector_backend": self.vector_db.stats() if self.vector_db is not None else {},
+            "startup": self.readiness()["components"]
+        }
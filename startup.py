@@ -0,0 +1,81 @@
+from typing import Dict, Callable, Optional
+import logging
+import threading
+import time
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceNotReady(Exception):
+    pass
+
+
+class Component:
+    """One piece of the service that loads in the background (model, vector index, chunk store)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.started_at: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        self._ready = threading.Event()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self, load: Callable[[], None], retry: bool = False):
+        """Run `load` on a daemon thread; with `retry`, failures are retried with backoff until it succeeds"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, args=(load, retry), name=f"docsearch-startup-{self.name}", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, load: Callable[[], None], retry: bool):
+        self.started_at = time.time()
+        delay = config.STARTUP_RETRY_BACKOFF
+        while True:
+            self.attempts += 1
+            self.status = "loading"
+            try:
+                load()
+            except Exception as e:
+                self.error = str(e)
+                logger.warning("Startup: %s failed (attempt %d): %s", self.name, self.attempts, e)
+                if not retry:
+                    self.status = "failed"
+                    self._done.set()
+                    return
+                self.status = "retrying"
+                time.sleep(delay)
+                delay = min(delay * 2, config.STARTUP_RETRY_MAX_DELAY)
+                continue
+
+            self.error = None
+            self.status = "ready"
+            self.load_seconds = time.time() - self.started_at
+            logger.info("Startup: %s ready in %.2fs", self.name, self.load_seconds)
+            self._ready.set()
+            self._done.set()
+            return
+
+    def wait(self, timeout: Optional[float] = None):
+        self._done.wait(timeout)
+        if not self.ready:
+            raise ServiceNotReady(f"{self.name} is {self.status}" + (f": {self.error}" if self.error else ""))
+
+    def to_dict(self) -> Dict:
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "load_seconds": self.load_seconds,
+            "error": self.error
+        }
@@ -0,0 +1,34 @@
+from config import config
+from lexical_index import BM25Index
+
+
+def test_reindexed_chunk_still_matches():
+    index = BM25Index()
+    index.add("invoice.txt_0", "Invoice INV-7781 is due on the first of March")
+    index.add("invoice.txt_0", "Invoice INV-7781 is due on the first of April")
+
+    hits = index.search("INV-7781")
+    assert [vid for _, vid in hits] == ["invoice.txt_0"]
+    assert 0 < hits[0][0] < 1
+
+
+def test_readding_every_doc_keeps_idf_positive(monkeypatch):
+    # Keep the tombstones around so scoring has to skip them instead of relying on compaction
+    monkeypatch.setattr(config, "LEXICAL_COMPACT_RATIO", 1e9)
+    index = BM25Index()
+    docs = [(f"doc_{i}", f"course number {i}") for i in range(100)]
+    index.add_many(docs)
+    index.add_many(docs)
+
+    assert index._dead == 100
+    assert len(index.search("course", top_k=100)) == 100
+
+
+def test_readds_trigger_compaction():
+    index = BM25Index()
+    docs = [(f"doc_{i}", f"course number {i}") for i in range(100)]
+    index.add_many(docs)
+    index.add_many(docs)
+
+    assert index._dead == 0
+    assert len(index.search("course", top_k=100)) == 100